@@ -1,11 +1,20 @@
 # dashboard.py
 
+import pandas as pd
 import streamlit as st
 import streamlit_authenticator as stauth
 
+# Copy-on-Write: los frames cacheados se comparten entre sesiones y cada
+# acceso recibe una copia superficial; con CoW escribir en esa copia
+# nunca altera el original (ver cache_utils.frame_compartido)
+pd.set_option("mode.copy_on_write", True)
+
 # ------------------- IMPORTS PROPIOS -------------------
 from utils.config import cargar_config
 from utils.api_utils import mostrar_fecha_actualizacion
+from utils.cache_utils import refrescar_vista, contadores_single_flight, CargaFallida
+from utils.schema_utils import ESQUEMAS_VISTAS
+from utils.table_utils import inyectar_estilos_tablas
 
 # Secciones
 from secciones import compras, ventas, clientes, vendedores, cancelaciones, linea
@@ -98,9 +107,28 @@ if st.session_state["authentication_status"] is True:
         # --- SECCIÓN INFERIOR (Todo esto quedará pegado abajo) ---
         #st.divider() 
 
-        if st.button("Limpiar datos de memoria", use_container_width=True):
-            st.cache_data.clear()
-            st.rerun()
+        # Los datos se invalidan solos cuando corre el ETL (por vista y por
+        # contenido). Refrescar a mano una vista es solo para administradores
+        # y no toca el cache de las demás vistas ni de otros usuarios.
+        admins = st.secrets["auth"].get("admins", [])
+        if st.session_state.get("username") in admins:
+            with st.expander("Administración de datos"):
+                vista_refrescar = st.selectbox(
+                    "Vista",
+                    sorted(ESQUEMAS_VISTAS),
+                    key="admin_vista_refrescar"
+                )
+                if st.button("Refrescar vista", use_container_width=True):
+                    with st.spinner(f"Refrescando {vista_refrescar}..."):
+                        recargas = refrescar_vista(vista_refrescar)
+                    st.toast(f"{vista_refrescar}: {recargas} carga(s) actualizadas")
+
+                # Descargas reales vs. llamadas que esperaron una descarga en curso
+                contadores = contadores_single_flight()
+                st.caption(
+                    f"Descargas: {contadores['ejecutadas']} · "
+                    f"coalescidas: {contadores['coalescidas']}"
+                )
 
         # Tu función de fecha (la caja verde)
         mostrar_fecha_actualizacion()
@@ -113,23 +141,32 @@ if st.session_state["authentication_status"] is True:
             st.rerun()
 
     # ------------------- CONTENIDO PRINCIPAL -------------------
-    if opcion == "Compras vs Meta":
-        compras.mostrar(config)
+    # Hoja de estilos de las tablas HTML: una vez por página, no por tabla
+    inyectar_estilos_tablas()
+
+    # Una carga sin datos previos que servir falla aquí (hilo principal),
+    # no dentro de cada sección ni en los refrescos de fondo
+    try:
+        if opcion == "Compras vs Meta":
+            compras.mostrar(config)
+
+        elif opcion == "Ventas":
+            ventas.mostrar(config)
 
-    elif opcion == "Ventas":
-        ventas.mostrar(config)
+        elif opcion == "Clientes / Ubicación":
+            clientes.mostrar(config)
 
-    elif opcion == "Clientes / Ubicación":
-        clientes.mostrar(config)
+        elif opcion == "Vendedores":
+            vendedores.mostrar(config)
 
-    elif opcion == "Vendedores":
-        vendedores.mostrar(config)
+        elif opcion == "Cancelaciones":
+            cancelaciones.mostrar(config)
 
-    elif opcion == "Cancelaciones":
-        cancelaciones.mostrar(config)
+        elif opcion == "Ventas por línea":
+            linea.mostrar(config)
 
-    elif opcion == "Ventas por línea":
-        linea.mostrar(config)
+    except CargaFallida as e:
+        st.error(f"❌ No se pudieron cargar los datos de la sección ({e}). Se reintentará en breve.")
 
 elif st.session_state["authentication_status"] is False:
     st.error("❌ Usuario o contraseña incorrectos")
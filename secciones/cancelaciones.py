@@ -1,18 +1,52 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
+import numpy as np
 from utils.api_utils import obtener_vista
+from utils.cache_utils import cache_swr, mostrar_indicador_refresco
+from utils.duckdb_utils import consulta
+from utils.table_utils import mostrar_tabla_normal, FILAS_PAGINAR
 
+
+VISTA_CANCELACIONES = "vw_cancelaciones_clientes_detalle"
+
+
+def normalizar_texto_categorico(serie):
+    """
+    strip + upper sobre los valores únicos (categorías) en lugar de fila
+    por fila. Si dos categorías quedan iguales (" abc" y "ABC") se
+    fusionan recodificando los códigos. Todos los nulos (None o NaN)
+    quedan como "NONE"; el astype(str).str.upper() anterior dejaba None
+    como "NONE" pero NaN como "NAN".
+    """
+    cat = serie.astype("category")
+    limpias = cat.cat.categories.astype(str).str.strip().str.upper()
+    codigos = cat.cat.codes.to_numpy()
+
+    if (codigos == -1).any():
+        limpias = limpias.append(pd.Index(["NONE"]))
+        codigos = np.where(codigos == -1, len(limpias) - 1, codigos)
+
+    nuevas = pd.Index(limpias.unique()).sort_values()
+    recodificar = nuevas.get_indexer(limpias)
+
+    return pd.Series(
+        pd.Categorical.from_codes(recodificar[codigos], categories=nuevas),
+        index=serie.index,
+        name=serie.name
+    )
+
+
+# Cache por versión de datos: la limpieza corre una vez por ETL y no
+# en cada interacción con los filtros
+@cache_swr(ttl=86400, vistas=[VISTA_CANCELACIONES])
 def cargar_datos():
-    df = obtener_vista("vw_cancelaciones_clientes_detalle")
-    if df is None or df.empty:
-        return None
-
-    # Asegurar tipos numéricos
-    df["facturas_canceladas"] = pd.to_numeric(df["facturas_canceladas"], errors="coerce").fillna(0)
-    df["mes"] = pd.to_numeric(df["mes"], errors="coerce").fillna(0).astype(int)
-    df["anio"] = pd.to_numeric(df["anio"], errors="coerce").fillna(0).astype(int)
-    
+    df = obtener_vista(VISTA_CANCELACIONES)
+    if df.empty:
+        return df  # cache_swr lo trata como falla
+
+    # facturas_canceladas / mes / anio ya llegan tipados (schema_utils)
+
     # DICCIONARIO MAESTRO PARA MESES EN ESPAÑOL
     meses_es = {
         1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril",
@@ -27,8 +61,10 @@ def cargar_datos():
     columnas_txt = ["vendedor", "Cliente", "Proveedor", "sucursal", "condicion_venta"]
     for col in columnas_txt:
         if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().str.upper()
-    
+            df[col] = normalizar_texto_categorico(df[col])
+
+    # Sus categorías son propias (VISTAS_SIN_CATALOGO): los textos crudos
+    # y "NONE" no entran al catálogo compartido de las demás vistas
     return df
 
 
@@ -38,7 +74,7 @@ def filtrar_datos(df):
         años = sorted(df['anio'].unique())
         año_sel = st.radio("Año", años, index=len(años)-1, horizontal=True)
     
-    df_f = df[df['anio'] == año_sel].copy()
+    df_f = df[df['anio'] == año_sel]
 
     with col2:
         sucursales = sorted(df_f['sucursal'].unique())
@@ -88,7 +124,7 @@ def grafica_mes_altair(df):
 
 def grafica_vendedores_altair(df):
     # Sumamos todos sin filtrar Top 10
-    data = df.groupby('vendedor', as_index=False)['facturas_canceladas'].sum()
+    data = df.groupby('vendedor', as_index=False, observed=True)['facturas_canceladas'].sum()
     
     # Ajustamos altura dinámica: 20px por cada vendedor para que no se amontonen
     altura = max(300, len(data) * 20)
@@ -111,20 +147,55 @@ def grafica_vendedores_altair(df):
     
     st.altair_chart(chart, use_container_width=True)
 
-def grafica_clientes_altair(df):
-    # 1. Identificamos los 30 clientes que más suman en total
-    top_30_nombres = (
-        df.groupby('Cliente')['facturas_canceladas']
+# Empates en el top: mismo criterio que nlargest (orden de categorías)
+SQL_TOP_POR_CONDICION = """
+WITH top AS (
+    SELECT "{columna}", SUM(facturas_canceladas) AS total
+    FROM cancelaciones
+    WHERE "{columna}" IS NOT NULL
+    GROUP BY "{columna}"
+    ORDER BY total DESC, "{columna}"
+    LIMIT {n}
+)
+SELECT c."{columna}", c.condicion_venta,
+       CAST(SUM(c.facturas_canceladas) AS BIGINT) AS facturas_canceladas
+FROM cancelaciones c
+WHERE c."{columna}" IN (SELECT "{columna}" FROM top)
+  AND c.condicion_venta IS NOT NULL
+GROUP BY c."{columna}", c.condicion_venta
+ORDER BY c."{columna}", c.condicion_venta
+"""
+
+
+def top_por_condicion(df, columna, n=30):
+    """Facturas canceladas por (columna, condicion_venta) de los `n` con más cancelaciones."""
+    return consulta(
+        f"cancelaciones.top_{columna.lower()}",
+        lambda: _top_por_condicion_pandas(df, columna, n),
+        SQL_TOP_POR_CONDICION.format(columna=columna, n=int(n)),
+        {"cancelaciones": df},
+    )
+
+
+def _top_por_condicion_pandas(df, columna, n):
+    # 1. Identificamos los n que más suman en total
+    top_nombres = (
+        df.groupby(columna, observed=True)['facturas_canceladas']
         .sum()
-        .nlargest(30)
+        .nlargest(n)
         .index
     )
-    
-    # 2. Filtramos el dataframe original para tener el detalle de esos 30
-    df_top = df[df['Cliente'].isin(top_30_nombres)]
-    
-    # 3. Agrupamos por Cliente y Condición para la gráfica
-    data = df_top.groupby(['Cliente', 'condicion_venta'], as_index=False)['facturas_canceladas'].sum()
+
+    # 2. Filtramos el dataframe original para tener el detalle de esos n
+    df_top = df[df[columna].isin(top_nombres)]
+
+    # 3. Agrupamos por la columna y la condición para la gráfica
+    return df_top.groupby([columna, 'condicion_venta'], as_index=False, observed=True)['facturas_canceladas'].sum()
+
+
+def grafica_clientes_altair(df):
+    # Top 30 clientes desglosados por condición de venta
+    data = top_por_condicion(df, 'Cliente')
 
     chart = alt.Chart(data).mark_bar().encode(
         # sort='-y' ordena por la suma total de las barras
@@ -149,19 +220,8 @@ def grafica_clientes_altair(df):
     )
 
 def grafica_proveedores_altair(df):
-    # 1. Identificamos los 30 proveedores que más suman en total
-    top_30_nombres = (
-        df.groupby('Proveedor')['facturas_canceladas']
-        .sum()
-        .nlargest(30)
-        .index
-    )
-    
-    # 2. Filtramos el dataframe original
-    df_top = df[df['Proveedor'].isin(top_30_nombres)]
-    
-    # 3. Agrupamos
-    data = df_top.groupby(['Proveedor', 'condicion_venta'], as_index=False)['facturas_canceladas'].sum()
+    # Top 30 proveedores desglosados por condición de venta
+    data = top_por_condicion(df, 'Proveedor')
     
     chart = alt.Chart(data).mark_bar().encode(
         x=alt.X('Proveedor:N', sort='-y', title="Proveedor (Top 30)"),
@@ -183,11 +243,31 @@ def grafica_proveedores_altair(df):
         use_container_width=True
     )
 
+COLUMNAS_DETALLE = [
+    "anio", "mes_nombre", "sucursal", "vendedor", "Cliente",
+    "Proveedor", "condicion_venta", "facturas_canceladas"
+]
+
+
+def tabla_detalle(df):
+    # La vista es a nivel cliente/proveedor: con muchas filas se pagina
+    # en el servidor y al grid solo viaja la página visible
+    detalle = df[[col for col in COLUMNAS_DETALLE if col in df.columns]]
+    mostrar_tabla_normal(
+        detalle,
+        columnas_fijas=["sucursal"],
+        columnas_numericas=["facturas_canceladas"],
+        columna_total="facturas_canceladas",
+        paginar=len(detalle) > FILAS_PAGINAR,
+        key="cancelaciones_detalle"
+    )
+
+
 def mostrar(config):
     st.title("Cancelaciones")
+    mostrar_indicador_refresco(cargar_datos)
     
     df_raw = cargar_datos()
-    if df_raw is None: return
 
     df_filtrado, sucursal_label = filtrar_datos(df_raw)
     
@@ -211,4 +291,7 @@ def mostrar(config):
 
     st.markdown("---")
     st.subheader("Desglose por Proveedor")
-    grafica_proveedores_altair(df_filtrado)
\ No newline at end of file
+    grafica_proveedores_altair(df_filtrado)
+
+    with st.expander("Ver detalle de cancelaciones"):
+        tabla_detalle(df_filtrado)
\ No newline at end of file
@@ -1,35 +1,43 @@
 # secciones/clientes.py
 
+import functools
 import streamlit as st
 import plotly.express as px
 import pandas as pd
 from utils.api_utils import obtener_vista
+from utils.cache_utils import cache_swr, frame_compartido, mostrar_indicador_refresco
+from utils.indice_utils import jerarquia_opciones
+from utils.render_utils import mostrar_plotly_cacheado
 
 
 # ======================================================
 # 1️⃣ CARGA BASE (API → DF) | cache 24h
 # ======================================================
-@st.cache_data(ttl=86400)
+@cache_swr(ttl=86400, vistas=["vw_dashboard_ubicacion_clientes_mes"])
 def cargar_clientes_base():
-    df = obtener_vista("vw_dashboard_ubicacion_clientes_mes")
-    if df.empty:
-        raise ValueError("Vista clientes vacía, no se cachea")
+    df = obtener_vista(
+        "vw_dashboard_ubicacion_clientes_mes",
+        columnas=[
+            "anio", "mes_nombre", "Estado", "Ciudad", "cliente_latitud", "cliente_longitud",
+            "sucursal", "sucursal_latitud", "sucursal_longitud",
+            "clientes_unicos", "venta_total", "facturas"
+        ]
+    )
     return df
 
 
 # ======================================================
 # 2️⃣ LIMPIEZA PESADA | cache 24h
 # ======================================================
-@st.cache_data(ttl=86400)
-def preparar_clientes_limpio(df_base: pd.DataFrame) -> pd.DataFrame:
-    df = df_base.copy()
-
-    # Validación geográfica
-    df = df[
-        (df["cliente_latitud"].between(-90, 90)) &
-        (df["cliente_longitud"].between(-180, 180)) &
-        (df["cliente_latitud"] != 0) &
-        (df["cliente_longitud"] != 0)
+@frame_compartido(ttl=86400)
+def preparar_clientes_limpio(_df_base: pd.DataFrame, version: str) -> pd.DataFrame:
+    # Llave = versión de cargar_clientes_base; el frame no se hashea
+    # Validación geográfica (el filtro ya produce un frame nuevo)
+    df = _df_base[
+        (_df_base["cliente_latitud"].between(-90, 90)) &
+        (_df_base["cliente_longitud"].between(-180, 180)) &
+        (_df_base["cliente_latitud"] != 0) &
+        (_df_base["cliente_longitud"] != 0)
     ]
 
     # Redondeo para estabilidad del mapa
@@ -75,7 +83,8 @@ def obtener_datos_mapa_sucursales(df_limpio, anio_seleccionado, mes_seleccionado
             "sucursal_latitud",
             "sucursal_longitud"
         ],
-        as_index=False
+        as_index=False,
+        observed=True
     ).agg({
         "venta_total": "sum",
         "clientes_unicos": "sum",
@@ -96,14 +105,12 @@ def obtener_datos_mapa_sucursales(df_limpio, anio_seleccionado, mes_seleccionado
 # ======================================================
 # SELECTORES
 # ======================================================
-def selector_periodo(df):
+def selector_periodo(jerarquia):
+    """jerarquia = año → [meses] (jerarquia_opciones), armada una vez por versión."""
     st.markdown("### Filtros de periodo")
-    anios = sorted(df["anio"].dropna().unique().tolist(), reverse=True)
-    anio_sel = st.selectbox("Año", anios, index=0)
+    anio_sel = st.selectbox("Año", list(jerarquia), index=0)
 
-    df_anio = df[df["anio"] == anio_sel]
-    meses = ["Todos"] + sorted(df_anio["mes_nombre"].dropna().unique().tolist())
-    mes_sel = st.selectbox("Mes", meses, index=0)
+    mes_sel = st.selectbox("Mes", jerarquia[anio_sel], index=0)
 
     return anio_sel, mes_sel
 
@@ -200,7 +207,7 @@ def _fig_barras_sucursal(
 
 
 
-def grafico_barras_sucursales(df_limpio, anio_seleccionado, mes_seleccionado):
+def _sucursales_periodo(df_limpio, anio_seleccionado, mes_seleccionado):
 
     # -----------------------------
     # Filtro periodo
@@ -211,32 +218,29 @@ def grafico_barras_sucursales(df_limpio, anio_seleccionado, mes_seleccionado):
         df = df[df["mes_nombre"] == mes_seleccionado]
 
     if df.empty:
-        st.warning("No hay datos para el periodo seleccionado.")
-        return
+        return None
 
     # -----------------------------
     # Agrupación
     # -----------------------------
     df_suc = df.groupby(
         ["sucursal"],
-        as_index=False
+        as_index=False,
+        observed=True
     ).agg({
         "venta_total": "sum",
         "clientes_unicos": "sum",
         "facturas": "sum"
     })
 
-    df_suc = df_suc[df_suc["venta_total"] > 0]
+    return df_suc[df_suc["venta_total"] > 0]
 
-    # Orden base
-    df_venta = df_suc.sort_values("venta_total", ascending=True)
-    df_clientes = df_suc.sort_values("clientes_unicos", ascending=True)
 
-    # -----------------------------
-    # Figuras
-    # -----------------------------
-    fig_venta = _fig_barras_sucursal(
-        df_plot=df_venta,
+def _fig_venta_sucursal(df_suc):
+    if df_suc is None:
+        return None
+    return _fig_barras_sucursal(
+        df_plot=df_suc.sort_values("venta_total", ascending=True),
         eje_x="venta_total",
         titulo="Ventas totales por sucursal",
         formato_x="$,.2f",
@@ -251,8 +255,12 @@ def grafico_barras_sucursales(df_limpio, anio_seleccionado, mes_seleccionado):
         )
     )
 
-    fig_clientes = _fig_barras_sucursal(
-        df_plot=df_clientes,
+
+def _fig_clientes_sucursal(df_suc):
+    if df_suc is None:
+        return None
+    return _fig_barras_sucursal(
+        df_plot=df_suc.sort_values("clientes_unicos", ascending=True),
         eje_x="clientes_unicos",
         titulo="Clientes únicos por sucursal",
         formato_x=",",
@@ -267,25 +275,51 @@ def grafico_barras_sucursales(df_limpio, anio_seleccionado, mes_seleccionado):
         )
     )
 
+
+def grafico_barras_sucursales(df_limpio, anio_seleccionado, mes_seleccionado, version):
+    # Figuras cacheadas por versión y periodo: el filtro y la agrupación
+    # solo corren si falta alguna, y una sola vez para las dos
+    parametros = (anio_seleccionado, mes_seleccionado)
+    df_suc = functools.cache(
+        lambda: _sucursales_periodo(df_limpio, anio_seleccionado, mes_seleccionado)
+    )
+
     # -----------------------------
     # Layout responsive
     # -----------------------------
     col1, col2 = st.columns(2)
 
     with col1:
-        st.plotly_chart(fig_venta, use_container_width=True)
+        hay_datos = mostrar_plotly_cacheado(
+            "clientes.barras_venta", version, parametros,
+            lambda: _fig_venta_sucursal(df_suc()), use_container_width=True
+        )
 
     with col2:
-        st.plotly_chart(fig_clientes, use_container_width=True)
+        mostrar_plotly_cacheado(
+            "clientes.barras_clientes", version, parametros,
+            lambda: _fig_clientes_sucursal(df_suc()), use_container_width=True
+        )
 
+    if not hay_datos:
+        st.warning("No hay datos para el periodo seleccionado.")
 
 
-def mapa_sucursales_facturacion(df_suc):
+def mapa_sucursales_facturacion(df_suc, version, parametros):
 
     if df_suc.empty:
         st.warning("No hay datos de sucursales para el periodo seleccionado.")
         return
 
+    mostrar_plotly_cacheado(
+        "clientes.mapa_sucursales", version, parametros,
+        lambda: _fig_mapa_sucursales(df_suc),
+        use_container_width=True,
+        config={"scrollZoom": True}
+    )
+
+
+def _fig_mapa_sucursales(df_suc):
     fig = px.scatter_mapbox(
         df_suc,
         lat="sucursal_latitud",
@@ -322,12 +356,7 @@ def mapa_sucursales_facturacion(df_suc):
             len=0.7
         )
     )
-
-    st.plotly_chart(
-        fig,
-        use_container_width=True,
-        config={"scrollZoom": True}
-    )
+    return fig
 
 
 
@@ -338,19 +367,24 @@ def mapa_sucursales_facturacion(df_suc):
 def mostrar(config):
 
     st.title("Clientes / Ubicación")
+    mostrar_indicador_refresco(cargar_clientes_base)
     st.markdown("***** En producción *********")
 
     # 🔥 WARM-UP (solo una vez por sesión)
     if "warmup_clientes" not in st.session_state:
-        df_base = cargar_clientes_base()
-        preparar_clientes_limpio(df_base)
+        df_base, version = cargar_clientes_base.con_version()
+        preparar_clientes_limpio(df_base, version)
         st.session_state["warmup_clientes"] = True
 
     # Uso normal
-    df_base = cargar_clientes_base()
-    df_limpio = preparar_clientes_limpio(df_base)
+    df_base, version = cargar_clientes_base.con_version()
+    df_limpio = preparar_clientes_limpio(df_base, version)
 
-    anio_sel, mes_sel = selector_periodo(df_limpio)
+    jerarquia = jerarquia_opciones(
+        "clientes_limpio", df_limpio, ("anio", "mes_nombre"), version,
+        totales={"mes_nombre": "Todos"}, orden={"anio": ("anio", True)}
+    )
+    anio_sel, mes_sel = selector_periodo(jerarquia)
 
     df_clientes = obtener_datos_mapa_clientes(
         df_limpio, anio_sel, mes_sel
@@ -365,6 +399,6 @@ def mostrar(config):
     )
 
     mapa_facturacion_clientes(df_clientes)
-    grafico_barras_sucursales(df_limpio, anio_sel, mes_sel)
-    mapa_sucursales_facturacion(df_sucursales)
+    grafico_barras_sucursales(df_limpio, anio_sel, mes_sel, version)
+    mapa_sucursales_facturacion(df_sucursales, version, (anio_sel, mes_sel))
 
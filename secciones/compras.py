@@ -5,20 +5,17 @@ import streamlit.components.v1 as components
 import altair as alt
 import pandas as pd
 from utils.api_utils import obtener_vista
+from utils.cache_utils import cache_swr, mostrar_indicador_refresco
 from utils.table_utils import mostrar_tabla_matriz
+from utils.render_utils import mostrar_altair_cacheado
 from datetime import datetime
 
 # ======================================================
 # 1️⃣ CARGA DE DATOS CACHEADA (24 HORAS)
 # ======================================================
-@st.cache_data(ttl=86400) # 👈 Aquí definimos las 24 horas
+@cache_swr(ttl=86400, vistas=["vw_division_vs_meta_jd"]) # 👈 24 horas; al expirar se refresca en segundo plano
 def cargar_datos_compras():
-    try:
-        df = obtener_vista("vw_division_vs_meta_jd")
-        return df
-    except Exception as e:
-        st.error(f"Error al cargar datos de compras: {e}")
-        return pd.DataFrame()
+    return obtener_vista("vw_division_vs_meta_jd")
 
 def agregar_semaforo(df):
     df = df.copy()
@@ -182,9 +179,15 @@ def grafico_ejecucion_vs_meta_mes_actual(df_mes):
     st.altair_chart(chart, use_container_width=True)
 
 
-def grafico_cumplimiento_historico(df):
+def grafico_cumplimiento_historico(df, version):
     st.subheader("Cumplimiento de meta por mes (%)")
+    mostrar_altair_cacheado(
+        "compras.cumplimiento_historico", version, (), lambda: chart_cumplimiento_historico(df)
+    )
+    st.caption("🔹 Línea punteada gris = Meta general de cumplimiento (100%)")
+
 
+def chart_cumplimiento_historico(df):
     df_hist = df[df["compra_real"] > 0].copy()
     df_hist["orden_mes"] = df_hist["anio_jd"] * 100 + df_hist["mes_jd"]
     df_hist = df_hist.sort_values("orden_mes")
@@ -244,10 +247,7 @@ def grafico_cumplimiento_historico(df):
         )
     )
 
-    chart = (lineas + linea_meta).properties(height=360).interactive()
-
-    st.altair_chart(chart, use_container_width=True)
-    st.caption("🔹 Línea punteada gris = Meta general de cumplimiento (100%)")
+    return (lineas + linea_meta).properties(height=360).interactive()
 
 
 def grafico_meta_vs_compra_por_division(df, division):
@@ -342,8 +342,9 @@ def grafico_meta_vs_compra_por_division(df, division):
 
 def mostrar(config):
     st.title("Compras vs Meta")
+    mostrar_indicador_refresco(cargar_datos_compras)
 
-    df = cargar_datos_compras()
+    df, version = cargar_datos_compras.con_version()
 
     if df.empty:
         st.warning("No hay datos disponibles de compras.")
@@ -369,7 +370,7 @@ def mostrar(config):
     grafico_ejecucion_vs_meta_mes_actual(df_mes)
 
     # 3️⃣ Tendencia histórica
-    grafico_cumplimiento_historico(df)
+    grafico_cumplimiento_historico(df, version)
 
     grafico_meta_vs_compra_por_division(df, "Agrícola")
     grafico_meta_vs_compra_por_division(df, "Construcción")
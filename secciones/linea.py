@@ -2,75 +2,268 @@ import streamlit as st
 import plotly.express as px
 import pandas as pd
 import datetime
+import itertools
 import altair as alt
 import pandas as pd
-from utils.api_utils import obtener_vista
+from utils.api_utils import obtener_vistas
+from utils.cache_utils import cache_swr, mostrar_indicador_refresco
+from utils.duckdb_utils import consulta
+from utils.indice_utils import frame_indexado, seleccionar, jerarquia_opciones
 from utils.table_utils import mostrar_tabla_normal_cloud
 
 
 # ======================================================
 # 1️⃣ CARGA DE DATOS (API → DF)
 # ======================================================
-@st.cache_data(ttl=86400)
+# Solo las columnas que usan filtros, gráficas y tablas de la sección
+COLUMNAS_VISTAS_LINEA = {
+    "vw_dashboard_metas_sucursal_por_linea": {
+        "columnas": [
+            "anio", "mes", "mes_nombre", "periodo_jd", "linea", "sucursal",
+            "venta_real", "costo_real", "utilidad_real", "margen_real", "meta_sucursal_linea"
+        ]
+    },
+    "vw_dashboard_metas_por_linea": {
+        "columnas": [
+            "anio", "mes_nombre", "linea", "sucursal", "vendedor",
+            "venta_real", "costo_real", "utilidad_real", "margen_real",
+            "meta_vendedor_linea", "porcentaje_cumplimiento", "semaforo"
+        ]
+    },
+    "vw_dashboard_venta_linea_proveedor": {
+        "columnas": [
+            "anio", "mes", "mes_nombre", "periodo_jd", "linea", "sucursal", "Proveedor",
+            "venta_real", "costo_real", "utilidad_real", "margen_real"
+        ]
+    },
+}
+
+@cache_swr(ttl=86400, vistas=list(COLUMNAS_VISTAS_LINEA))
 def cargar_datos_lineas_completo():
+    # Las tres vistas se piden en paralelo
+    vistas = obtener_vistas(
+        list(COLUMNAS_VISTAS_LINEA),
+        opciones=COLUMNAS_VISTAS_LINEA
+    )
+    df_suc = vistas["vw_dashboard_metas_sucursal_por_linea"]
+    df_ven = vistas["vw_dashboard_metas_por_linea"]
+    df_pro = vistas["vw_dashboard_venta_linea_proveedor"]
+    return df_suc, df_ven, df_pro
+
+# ======================================================
+# 2️⃣ CUBO PRE-AGREGADO (una vez por versión de datos)
+# ======================================================
+# Cada combinación de filtros es una celda del cubo: las opciones
+# "TODAS"/"TODOS" son miembros de total ya calculados, así que cambiar
+# un selector es un .loc sobre el índice ordenado y no un filtro +
+# groupby sobre las vistas crudas.
+TOTAL_LINEA = "TODAS"
+TOTAL_MES = "TODOS"
+TOTAL_SUCURSAL = "TODAS"
+
+MEDIDAS_SUCURSAL = ["venta_real", "costo_real", "utilidad_real", "meta_sucursal_linea"]
+MEDIDAS_PROVEEDOR = ["venta_real", "costo_real", "utilidad_real"]
+
+# Dimensiones que tienen fila de total (la de mes arrastra mes/periodo_jd)
+ROLLUPS_LINEA = {"mes_nombre": TOTAL_MES, "linea": TOTAL_LINEA, "sucursal": TOTAL_SUCURSAL}
+
+# periodo_jd nulo dentro del cubo (como lo dejaba astype(str)); las tablas
+# de detalle lo excluyen, igual que su groupby original
+SIN_PERIODO = "nan"
+
+
+def _agregar_con_totales(df, niveles, medidas):
+    """
+    Suma `medidas` por `niveles` más todas las combinaciones de totales
+    de ROLLUPS_LINEA. El margen se promedia como en las tablas originales
+    (suma / conteo de filas con margen), por eso se acumula por separado.
+    Como el groupby por vista de antes (dropna), una fila con nulo en un
+    nivel (o en mes) no entra a los desgloses de ese nivel; sí a sus totales.
+    """
+    plano = consulta(
+        f"linea.cubo_{niveles[-1].lower()}",
+        lambda: _agregar_con_totales_pandas(df, niveles, medidas),
+        _sql_agregar_con_totales(niveles, medidas),
+        {"base": df},
+        ignorar_orden=True,  # el cubo se ordena por índice después
+    )
+    plano["margen_real"] = plano["margen_suma"] / plano["margen_n"].where(plano["margen_n"] > 0)
+
+    return (
+        plano.drop(columns=["margen_suma", "margen_n"])
+        .set_index(niveles)
+        .sort_index()
+    )
+
+
+def _agregar_con_totales_pandas(df, niveles, medidas):
+    base = df[niveles + ["mes", "periodo_jd"] + medidas + ["margen_real"]].copy()
+
+    # Texto para que el miembro de total conviva con los valores reales;
+    # los niveles nulos siguen nulos y periodo_jd nulo queda como SIN_PERIODO
+    for col in niveles[1:]:
+        base[col] = base[col].astype(str).where(base[col].notna())
+    base["periodo_jd"] = base["periodo_jd"].astype(str).where(base["periodo_jd"].notna(), SIN_PERIODO)
+
+    base["margen_suma"] = base["margen_real"].fillna(0)
+    base["margen_n"] = base["margen_real"].notna().astype("int32")
+
+    llaves = niveles + ["mes", "periodo_jd"]
+    sumas = medidas + ["margen_suma", "margen_n"]
+
+    partes = []
+    for k in range(len(ROLLUPS_LINEA) + 1):
+        for combinacion in itertools.combinations(ROLLUPS_LINEA, k):
+            totales = {col: ROLLUPS_LINEA[col] for col in combinacion}
+            if "mes_nombre" in totales:
+                totales.update(mes=0, periodo_jd=TOTAL_MES)
+            desglosados = [col for col in niveles if col not in totales]
+            partes.append(
+                base.assign(**totales)
+                .dropna(subset=desglosados)
+                .groupby(llaves, as_index=False, sort=False)[sumas]
+                .sum()
+            )
+
+    return pd.concat(partes, ignore_index=True)
+
+
+def _sql_agregar_con_totales(niveles, medidas):
+    """La misma agregación con GROUPING SETS (una pasada por DuckDB)."""
+    def _texto(col, total=None, nulo=None):
+        valor = f"CAST(\"{col}\" AS VARCHAR)"
+        if nulo is not None:
+            valor = f"COALESCE({valor}, '{nulo}')"
+        if total is None:
+            return f"{valor} AS \"{col}\""
+        return f"CASE WHEN GROUPING(\"{col}\") = 1 THEN '{total}' ELSE {valor} END AS \"{col}\""
+
+    columnas = ['"anio"'] + [_texto(col, ROLLUPS_LINEA.get(col)) for col in niveles[1:]]
+    columnas += [
+        'CASE WHEN GROUPING("mes") = 1 THEN 0 ELSE "mes" END AS "mes"',
+        _texto("periodo_jd", TOTAL_MES, SIN_PERIODO),
+    ]
+    columnas += [f'SUM("{m}") AS "{m}"' for m in medidas]
+    columnas += [
+        'SUM(COALESCE("margen_real", 0)) AS "margen_suma"',
+        'COUNT("margen_real") AS "margen_n"',
+    ]
+
+    conjuntos = []
+    for k in range(len(ROLLUPS_LINEA) + 1):
+        for combinacion in itertools.combinations(ROLLUPS_LINEA, k):
+            grupo = [col for col in niveles if col not in combinacion]
+            if "mes_nombre" not in combinacion:
+                grupo += ["mes", "periodo_jd"]
+            conjuntos.append("(" + ", ".join(f'"{col}"' for col in grupo) + ")")
+
+    # Los totales ya traen su etiqueta: un nulo que queda es un grupo de
+    # valores nulos en un nivel desglosado y se descarta (dropna de pandas)
+    no_nulos = " AND ".join(f'"{col}" IS NOT NULL' for col in niveles + ["mes"])
+    return (
+        "SELECT * FROM (\nSELECT " + ",\n       ".join(columnas)
+        + "\nFROM base\nGROUP BY GROUPING SETS (" + ", ".join(conjuntos) + ")"
+        + "\n) AS cubo\nWHERE " + no_nulos
+    )
+
+
+def construir_cubos_linea(df_suc, df_prov, version):
+    """
+    Cubos (sucursal, proveedor) de la versión `version` de los datos.
+    Se comparten entre sesiones: las consultas regresan rebanadas nuevas,
+    nunca modifican el cubo. Sin versión no hay llave confiable y se
+    arman sin cachear.
+    """
+    if version is None:
+        return _armar_cubos_linea(df_suc, df_prov)
+    return _cubos_linea_cacheados(df_suc, df_prov, version)
+
+
+@st.cache_resource(ttl=86400, max_entries=2, show_spinner="Preparando cubo de líneas...")
+def _cubos_linea_cacheados(_df_suc, _df_prov, version):
+    return _armar_cubos_linea(_df_suc, _df_prov)
+
+
+def _armar_cubos_linea(df_suc, df_prov):
+    cubo_suc = _agregar_con_totales(
+        df_suc, ["anio", "mes_nombre", "linea", "sucursal"], MEDIDAS_SUCURSAL
+    )
+    cubo_prov = _agregar_con_totales(
+        df_prov, ["anio", "mes_nombre", "linea", "sucursal", "Proveedor"], MEDIDAS_PROVEEDOR
+    )
+    return cubo_suc, cubo_prov
+
+
+def consultar_cubo(cubo, **miembros):
+    """
+    miembros = nivel → valor (incluye los totales "TODAS"/"TODOS").
+    Los niveles que no se pasan se desglosan, sin su fila de total.
+    """
+    llave = tuple(
+        [miembros[nivel]] if nivel in miembros else slice(None)
+        for nivel in cubo.index.names
+    )
     try:
-        df_suc = obtener_vista("vw_dashboard_metas_sucursal_por_linea")
-        df_ven = obtener_vista("vw_dashboard_metas_por_linea")
-        df_pro = obtener_vista("vw_dashboard_venta_linea_proveedor")
-        return df_suc, df_ven, df_pro
-    except Exception as e:
-        st.error(f"Error al conectar con la API: {e}")
-        return None, None, None
+        rebanada = cubo.loc[llave, :]
+    except KeyError:
+        return cubo.iloc[0:0].reset_index()
+
+    for nivel in cubo.index.names:
+        if nivel not in miembros:
+            rebanada = rebanada[~rebanada.index.get_level_values(nivel).isin(list(ROLLUPS_LINEA.values()))]
+
+    return rebanada.reset_index()
+
+
+def desglosar(seleccion, *niveles):
+    """Quita de la selección los `niveles` que están en su total para repartirlos en filas."""
+    return {
+        nivel: valor for nivel, valor in seleccion.items()
+        if not (nivel in niveles and valor == ROLLUPS_LINEA.get(nivel))
+    }
+
 
 # ======================================================
-# 2️⃣ LÓGICA DE FILTRADO
+# 3️⃣ LÓGICA DE FILTRADO
 # ======================================================
-def filtrar_datos(df, linea, anio, mes, sucursal):
-    mask = (df['anio'] == anio)
-    if linea != "TODAS":
-        mask = mask & (df['linea'] == linea)
-    if mes != "TODOS":
-        mask = mask & (df['mes_nombre'] == mes)
-    if sucursal != "TODAS":
-        mask = mask & (df['sucursal'] == sucursal)
-    return df[mask]
+# Llaves por las que se ordena e indexa cada vista (ver indice_utils)
+LLAVES_FILTRO_LINEA = ("anio", "mes_nombre", "linea", "sucursal")
+
+
+def filtrar_datos(df_indexado, linea, anio, mes, sucursal):
+    """df_indexado viene de frame_indexado(..., LLAVES_FILTRO_LINEA, ...)."""
+    return seleccionar(
+        df_indexado, anio=anio, mes_nombre=mes, linea=linea, sucursal=sucursal
+    )
 
 # ======================================================
-# 3️⃣ COMPONENTES DE INTERFAZ (UI)
+# 4️⃣ COMPONENTES DE INTERFAZ (UI)
 # ======================================================
 
-def renderizar_filtros(df_sucursal):
-    """Crea la fila de selectores y devuelve los valores seleccionados con orden cronológico."""
+# línea → año → mes → sucursal; los meses en orden cronológico
+NIVELES_FILTRO_LINEA = ("linea", "anio", "mes_nombre", "sucursal")
+ORDEN_FILTRO_LINEA = {"anio": ("anio", True), "mes_nombre": ("mes", False)}
+
+
+def renderizar_filtros(jerarquia):
+    """Crea la fila de selectores y devuelve los valores seleccionados con orden cronológico.
+    Las opciones salen de la jerarquía precalculada (jerarquia_opciones)."""
     st.markdown("### Filtros de Consulta")
     f1, f2, f3, f4 = st.columns(4)
 
     with f1:
-        lista_lineas = ["TODAS"] + sorted(df_sucursal['linea'].unique().tolist())
-        linea_sel = st.selectbox("Línea", lista_lineas)
-
-    # DataFrame de referencia para filtros dependientes
-    df_ref = df_sucursal if linea_sel == "TODAS" else df_sucursal[df_sucursal['linea'] == linea_sel]
+        linea_sel = st.selectbox("Línea", list(jerarquia))
 
+    anios = jerarquia[linea_sel]
     with f2:
-        lista_anios = sorted(df_ref['anio'].unique(), reverse=True)
-        anio_sel = st.selectbox("Año", lista_anios)
+        anio_sel = st.selectbox("Año", list(anios))
 
+    meses = anios[anio_sel]
     with f3:
-        # --- Lógica de ordenamiento cronológico ---
-        # Filtramos por el año seleccionado y tomamos los pares (mes, mes_nombre) únicos
-        df_meses = df_ref[df_ref['anio'] == anio_sel][['mes', 'mes_nombre']].drop_duplicates()
-        
-        # Ordenamos por el número del mes (1, 2, 3...)
-        df_meses = df_meses.sort_values('mes')
-        
-        # Extraemos la lista de nombres ya ordenados
-        meses_disp = df_meses['mes_nombre'].tolist()
-        
-        mes_sel = st.selectbox("Mes", ["TODOS"] + meses_disp, index=0)
+        mes_sel = st.selectbox("Mes", list(meses), index=0)
 
     with f4:
-        lista_sucs = ["TODAS"] + sorted(df_ref['sucursal'].unique().tolist())
-        sucursal_sel = st.selectbox("Sucursal", lista_sucs)
+        sucursal_sel = st.selectbox("Sucursal", meses[mes_sel])
 
     return linea_sel, anio_sel, mes_sel, sucursal_sel
 
@@ -148,11 +341,12 @@ def renderizar_kpis(df, linea_nombre):
         </div>""", unsafe_allow_html=True)
 
 def grafico_barras_lineas(df, linea_sel):
-    """Gráfico de barras horizontales estilizado con alto dinámico y tooltips limpios."""
+    """Gráfico de barras horizontales estilizado con alto dinámico y tooltips limpios.
+    `df` trae una fila por línea (rebanada del cubo)."""
     st.subheader(f"Resumen de Ventas por Línea")
     
-    # Agrupación y orden
-    df_g = df.groupby('linea')['venta_real'].sum().reset_index().sort_values('venta_real', ascending=True)
+    # Ya viene una fila por línea desde el cubo; solo se ordena
+    df_g = df[['linea', 'venta_real']].sort_values('venta_real', ascending=True)
     
     # --- AJUSTE DINÁMICO DE ALTURA ---
     # Calculamos el alto: mínimo 300px, y sumamos 30px por cada línea adicional
@@ -207,7 +401,7 @@ def graficos_secundarios(df_suc, df_prov):
     
     with col1:
         st.subheader("Venta por Sucursal")
-        df_s = df_suc.groupby('sucursal')['venta_real'].sum().reset_index().sort_values('venta_real', ascending=True)
+        df_s = df_suc[['sucursal', 'venta_real']].sort_values('venta_real', ascending=True)
         
         # --- AJUSTE DINÁMICO ---
         num_sucs = len(df_s)
@@ -245,7 +439,7 @@ def graficos_secundarios(df_suc, df_prov):
     with col2:
         # 1. Actualizamos el título y el parámetro de nlargest
         st.subheader("Top 15 Proveedores")
-        df_p = df_prov.groupby('Proveedor')['venta_real'].sum().nlargest(15).reset_index().sort_values('venta_real', ascending=True)
+        df_p = df_prov.nlargest(15, 'venta_real')[['Proveedor', 'venta_real']].sort_values('venta_real', ascending=True)
         
         # --- AJUSTE DINÁMICO ---
         num_provs = len(df_p)
@@ -284,7 +478,8 @@ def graficos_secundarios(df_suc, df_prov):
                "pero este monto no suma a las métricas de venta por sucursal y vendedor.")
 
 def renderizar_tablas_detalle(df_suc_f, df_prov_f):
-    """Muestra tablas con comas forzadas convirtiendo los valores a string formateado."""
+    """Muestra tablas con comas forzadas convirtiendo los valores a string formateado.
+    Reciben rebanadas del cubo desglosadas por mes y sucursal / proveedor."""
     
     ahora = datetime.datetime.now()
     mes_actual = ahora.month
@@ -301,14 +496,12 @@ def renderizar_tablas_detalle(df_suc_f, df_prov_f):
             "margen_real": "Margen %"
         }
         
-        df_suc_tabla = df_suc_f.groupby(['anio', 'mes', 'periodo_jd', 'sucursal']).agg({
-            'venta_real': 'sum',
-            'costo_real': 'sum',
-            'utilidad_real': 'sum',
-            'margen_real': 'mean'
-        }).reset_index()
-
-        # Filtro de meses futuros
+        # Una fila por (mes, sucursal) del cubo, con el margen ya promediado
+        df_suc_tabla = df_suc_f[['anio', 'mes', 'periodo_jd', 'sucursal',
+                                 'venta_real', 'costo_real', 'utilidad_real', 'margen_real']].copy()
+
+        # Filtro de meses futuros (y sin periodo, como el groupby original)
+        df_suc_tabla = df_suc_tabla[df_suc_tabla['periodo_jd'] != SIN_PERIODO]
         df_suc_tabla = df_suc_tabla[~((df_suc_tabla['anio'] == anio_actual) & (df_suc_tabla['mes'] > mes_actual))]
         df_suc_tabla = df_suc_tabla.sort_values(['anio', 'mes', 'sucursal'])
 
@@ -340,13 +533,10 @@ def renderizar_tablas_detalle(df_suc_f, df_prov_f):
             "margen_real": "Margen %"
         }
 
-        df_prov_tabla = df_prov_f.groupby(['anio', 'mes', 'periodo_jd', 'Proveedor']).agg({
-            'venta_real': 'sum',
-            'costo_real': 'sum',
-            'utilidad_real': 'sum',
-            'margen_real': 'mean'
-        }).reset_index()
+        df_prov_tabla = df_prov_f[['anio', 'mes', 'periodo_jd', 'Proveedor',
+                                   'venta_real', 'costo_real', 'utilidad_real', 'margen_real']].copy()
 
+        df_prov_tabla = df_prov_tabla[df_prov_tabla['periodo_jd'] != SIN_PERIODO]
         df_prov_tabla = df_prov_tabla[~((df_prov_tabla['anio'] == anio_actual) & (df_prov_tabla['mes'] > mes_actual))]
         df_prov_tabla = df_prov_tabla.sort_values(['anio', 'mes', 'venta_real'], ascending=[True, True, False])
 
@@ -374,7 +564,8 @@ def renderizar_grafico_vendedores(df_vendedores, linea_sel, mes_sel):
     # 1. Limpieza y Normalización
     df_grafico["meta_vendedor_linea"] = df_grafico["meta_vendedor_linea"].fillna(0)
     df_grafico["semaforo"] = df_grafico["semaforo"].replace({"SIN META": "SIN_META"}).fillna("SIN_META")
-    df_grafico["etiqueta_vendedor"] = df_grafico["linea"] + " - " + df_grafico["vendedor"]
+    # linea y vendedor son categóricas: se concatenan como texto
+    df_grafico["etiqueta_vendedor"] = df_grafico["linea"].astype(str) + " - " + df_grafico["vendedor"].astype(str)
 
     # Agrupamos por vendedor
     df_grafico = df_grafico.groupby("etiqueta_vendedor").agg({
@@ -469,7 +660,7 @@ def renderizar_tabla_vendedores(df_vendedores):
 
     # 1. Agrupación y preparación de datos
     # Agrupamos por vendedor para consolidar si hay registros duplicados por alguna razón
-    df_tabla = df_vendedores.groupby('vendedor').agg({
+    df_tabla = df_vendedores.groupby('vendedor', observed=True).agg({
         'meta_vendedor_linea': 'sum',
         'venta_real': 'sum',
         'costo_real': 'sum',
@@ -506,40 +697,51 @@ def renderizar_tabla_vendedores(df_vendedores):
 
 
 # ======================================================
-# 4️⃣ ORQUESTADOR PRINCIPAL
+# 5️⃣ ORQUESTADOR PRINCIPAL
 # ======================================================
 def mostrar(config):
     st.title("Ventas por Línea")
+    mostrar_indicador_refresco(cargar_datos_lineas_completo)
     
     # 1. Carga
-    df_sucursal, df_vendedor, df_prov = cargar_datos_lineas_completo()
-    if df_sucursal is None or df_sucursal.empty:
+    (df_sucursal, df_vendedor, df_prov), version = cargar_datos_lineas_completo.con_version()
+    if df_sucursal.empty:
         st.warning("No hay datos disponibles.")
         return
 
     # 2. Filtros
-    linea_sel, anio_sel, mes_sel, sucursal_sel = renderizar_filtros(df_sucursal)
+    jerarquia = jerarquia_opciones(
+        "vw_dashboard_metas_sucursal_por_linea", df_sucursal, NIVELES_FILTRO_LINEA, version,
+        totales=ROLLUPS_LINEA, orden=ORDEN_FILTRO_LINEA
+    )
+    linea_sel, anio_sel, mes_sel, sucursal_sel = renderizar_filtros(jerarquia)
 
-    # 3. Procesamiento (AQUÍ FILTRAMOS LAS TRES VISTAS)
-    df_s_f = filtrar_datos(df_sucursal, linea_sel, anio_sel, mes_sel, sucursal_sel)
-    df_p_f = filtrar_datos(df_prov, linea_sel, anio_sel, mes_sel, sucursal_sel)
-    # Creamos la variable que te faltaba:
-    df_v_f = filtrar_datos(df_vendedor, linea_sel, anio_sel, mes_sel, sucursal_sel)
+    # 3. Procesamiento: consultas al cubo (sin filtrar las vistas crudas)
+    cubo_suc, cubo_prov = construir_cubos_linea(df_sucursal, df_prov, version)
+    seleccion = {"anio": anio_sel, "mes_nombre": mes_sel, "linea": linea_sel, "sucursal": sucursal_sel}
 
-    if df_s_f.empty:
+    df_kpi = consultar_cubo(cubo_suc, **seleccion)
+    if df_kpi.empty:
         st.info("No se encontraron registros para la selección actual.")
         return
 
+    # Desgloses: cada visual reparte en filas los niveles que están en total
+    df_lineas = consultar_cubo(cubo_suc, **desglosar(seleccion, "linea"))
+    df_sucursales = consultar_cubo(cubo_suc, **desglosar(seleccion, "sucursal"))
+    df_proveedores = consultar_cubo(cubo_prov, **seleccion)
+    df_suc_mes = consultar_cubo(cubo_suc, **desglosar(seleccion, "mes_nombre", "sucursal"))
+    df_prov_mes = consultar_cubo(cubo_prov, **desglosar(seleccion, "mes_nombre"))
+
     st.divider()
 
     # 4. Visualización
     # Gráfico de barras principal (Venta por Línea)
-    grafico_barras_lineas(df_s_f, linea_sel)
+    grafico_barras_lineas(df_lineas, linea_sel)
     
     #st.divider()
     
     # Números clave (Tarjetas)
-    renderizar_kpis(df_s_f, linea_sel)
+    renderizar_kpis(df_kpi, linea_sel)
     
 
     # --- NUEVA SECCIÓN: CUMPLIMIENTO DE VENDEDORES ---
@@ -547,12 +749,19 @@ def mostrar(config):
     #renderizar_grafico_vendedores(df_v_f, linea_sel, mes_sel)
 
     # Gráficos de Sucursal y Proveedores (los que hicimos con barras horizontales)
-    graficos_secundarios(df_s_f, df_p_f)
+    graficos_secundarios(df_sucursales, df_proveedores)
     
     # Tablas de detalle (las que formateamos con comas y sin $)
-    renderizar_tablas_detalle(df_s_f, df_p_f)
+    renderizar_tablas_detalle(df_suc_mes, df_prov_mes)
 
     if linea_sel != "TODAS":
+        # La vista de vendedores no entra al cubo: solo se filtra con línea elegida
+        df_v_idx = frame_indexado(
+            "vw_dashboard_metas_por_linea", df_vendedor,
+            LLAVES_FILTRO_LINEA, version
+        )
+        df_v_f = filtrar_datos(df_v_idx, linea_sel, anio_sel, mes_sel, sucursal_sel)
+
         # Mostramos el gráfico que ya tenías
         renderizar_grafico_vendedores(df_v_f, linea_sel, mes_sel)
         
@@ -5,34 +5,36 @@ import pandas as pd
 import altair as alt
 
 from utils.api_utils import obtener_vista
+from utils.cache_utils import cache_swr, frame_compartido, mostrar_indicador_refresco
+from utils.indice_utils import jerarquia_opciones
 from utils.table_utils import mostrar_tabla_normal_cloud
 
 
+ANIO_VENDEDORES = 2026
+
 # =========================================================
 # CARGA CONTROLADA DE DATOS (1 sola vez por sesión)
 # =========================================================
-@st.cache_data(ttl=86400)
+# permitir_vacios: el año de la sección puede no tener datos todavía
+@cache_swr(ttl=86400, vistas=["vw_dashboard_meta_vendedor_jd"], permitir_vacios=True)
 def cargar_datos_vendedores():
-    try:
-        with st.spinner("Obteniendo datos..."):
-            df = obtener_vista("vw_dashboard_meta_vendedor_jd")
-            if df is not None and not df.empty:
-                return df
-            else:
-                return pd.DataFrame()  # mejor que None, evita errores
-    except Exception:
-        return pd.DataFrame()
+    # Solo se descarga el año que muestra la sección
+    return obtener_vista(
+        "vw_dashboard_meta_vendedor_jd",
+        filtros={"anio": ANIO_VENDEDORES}
+    )
 
 
 
-@st.cache_data(ttl=86400)
-def filtrar_por_anio(df, anio):
-    return df[df["anio"] == anio].copy()
+# Llave = (versión de cargar_datos_vendedores, parámetros); los frames no se hashean
+@frame_compartido(ttl=86400)
+def filtrar_por_anio(_df, version, anio):
+    return _df[_df["anio"] == anio]
 
-@st.cache_data(ttl=86400)
-def agrupar_por_vendedor(df_filtrado):
+@frame_compartido(ttl=86400)
+def agrupar_por_vendedor(_df_filtrado, version, sucursal, periodo):
     return (
-        df_filtrado.groupby("vendedor", as_index=False)
+        _df_filtrado.groupby("vendedor", as_index=False, observed=True)
         .agg({
             "meta_vendedor": "first",
             "venta_real": "sum",
@@ -53,17 +55,18 @@ def agrupar_por_vendedor(df_filtrado):
 def mostrar(config):
     st.title("Vendedores")
     st.markdown("Análisis de rendimiento de vendedores")
+    mostrar_indicador_refresco(cargar_datos_vendedores)
 
     # -----------------------------
     # Cargar datos base
     # -----------------------------
-    df_raw = cargar_datos_vendedores()
+    df_raw, version = cargar_datos_vendedores.con_version()
 
-    if df_raw is None or df_raw.empty:
+    if df_raw.empty:
         st.warning("No hay datos disponibles de vendedores")
         st.stop()
 
-    df_base = filtrar_por_anio(df_raw, 2026)
+    df_base = filtrar_por_anio(df_raw, version, ANIO_VENDEDORES)
 
 
     if df_base.empty:
@@ -73,26 +76,30 @@ def mostrar(config):
     # =====================================================
     # FILTROS UI
     # =====================================================
+    # sucursal → meses con datos, armado una vez por versión de datos
+    jerarquia = jerarquia_opciones(
+        f"vendedores_{ANIO_VENDEDORES}", df_base, ("sucursal", "periodo_jd"),
+        version, totales={"sucursal": "Todos"}
+    )
+
     col1, col2 = st.columns(2)
 
     with col1:
-        sucursales = sorted(df_base["sucursal"].dropna().unique().tolist())
-        sucursales.insert(0, "Todos")
         sucursal_sel = st.selectbox(
             "Selecciona sucursal",
-            sucursales,
+            list(jerarquia),
             index=0,
             key="vendedores_sucursal"
         )
 
     # Filtrado intermedio para que el mes SIEMPRE tenga datos de la sucursal elegida
-    df_temp_sucursal = df_base.copy()
+    df_temp_sucursal = df_base
     if sucursal_sel != "Todos":
         df_temp_sucursal = df_temp_sucursal[df_temp_sucursal["sucursal"] == sucursal_sel]
 
     with col2:
-        # Extraemos los meses que SÍ existen para la sucursal seleccionada
-        meses_disponibles = sorted(df_temp_sucursal["periodo_jd"].dropna().unique().tolist())
+        # Meses que SÍ existen para la sucursal seleccionada
+        meses_disponibles = jerarquia[sucursal_sel]
         
         # Si no hay meses (caso raro), evitamos que truene el selectbox
         if not meses_disponibles:
@@ -111,13 +118,13 @@ def mostrar(config):
     # -----------------------------
     df_filtrado = df_temp_sucursal[
         df_temp_sucursal["periodo_jd"] == mes_sel
-    ].copy()
+    ]
 
     if df_filtrado.empty:
         st.info(f"No se encontraron datos para {sucursal_sel} en {mes_sel}")
         return
 
-    df_vendedor = agrupar_por_vendedor(df_filtrado)
+    df_vendedor = agrupar_por_vendedor(df_filtrado, version, sucursal_sel, mes_sel)
 
     # =====================================================
     # GRÁFICO
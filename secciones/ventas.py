@@ -3,8 +3,12 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
+from datetime import date
 
-from utils.api_utils import obtener_vista
+from utils.api_utils import obtener_vistas
+from utils.cache_utils import cache_swr, frame_compartido, mostrar_indicador_refresco, es_carga_fallida
+from utils.duckdb_utils import consulta
+from utils.render_utils import mostrar_altair_cacheado
 from utils.table_utils import mostrar_tabla_normal
 from utils.table_utils import mostrar_tabla_matriz
 from utils.table_utils import mostrar_tabla_matriz_html
@@ -23,60 +27,136 @@ def render_descripcion():
 
 
 
-@st.cache_data(ttl=86400)
-def cargar_ventas_base():
-    df = obtener_vista("vw_facturacion_sucursal_mes_jd")
+VISTA_VENTAS = "vw_facturacion_sucursal_mes_jd"
+VISTA_METAS = "vw_dashboard_meta_sucursal"
+VISTA_REFACCIONES = "vw_dashboard_comercial_refacciones_final"
+
+
+def opciones_vistas_ventas():
+    """Columnas y filtros que se envían a la API para cada vista de la sección."""
+    # La sección solo muestra el año fiscal más reciente (noviembre → octubre).
+    # Con año - 1 siempre entra el año fiscal vigente aunque el ETL vaya atrasado;
+    # el máximo exacto se sigue calculando en preparar_fiscal_cacheado.
+    filtro_fiscal = {"anio_fiscal_jd": (">=", date.today().year - 1)}
+
+    return {
+        VISTA_VENTAS: {
+            "columnas": [
+                "anio_fiscal_jd", "orden_mes_fiscal", "periodo_jd", "sucursal_id", "sucursal",
+                "venta_real", "costo_real", "utilidad_real", "margen_porcentaje"
+            ],
+            "filtros": filtro_fiscal,
+        },
+        VISTA_METAS: {
+            "columnas": [
+                "anio_fiscal_jd", "orden_mes_fiscal", "periodo_jd", "sucursal_id", "sucursal",
+                "venta_real", "meta", "porcentaje_cumplimiento", "semaforo"
+            ],
+            "filtros": filtro_fiscal,
+        },
+        VISTA_REFACCIONES: {
+            "columnas": [
+                "periodo_jd", "sucursal", "venta_mostrador", "margen_pct_mostrador",
+                "venta_servicio_subref", "venta_total_combinada", "meta_mes",
+                "pct_alcance_meta", "semaforo"
+            ],
+        },
+    }
+
+
+def cargar_ventas_base(df):
     if df.empty:
         raise ValueError("Vista ventas vacía")
-    df["venta_real"] = pd.to_numeric(df["venta_real"], errors="coerce").fillna(0)
     return df
 
 
-@st.cache_data(ttl=86400)
-def cargar_meta_base():
-    df_meta = obtener_vista("vw_dashboard_meta_sucursal")
+def cargar_meta_base(df_meta):
     if df_meta.empty:
         raise ValueError("Vista metas vacía")
-
-    df_meta["venta_real"] = pd.to_numeric(df_meta["venta_real"], errors="coerce").fillna(0)
-    df_meta["meta"] = pd.to_numeric(df_meta["meta"], errors="coerce").fillna(0)
-
     return df_meta
 
-@st.cache_data(ttl=86400)
-def cargar_detalle_refacciones_final():
-    df = obtener_vista("vw_dashboard_comercial_refacciones_final")
+
+def cargar_detalle_refacciones_final(df):
     if df.empty:
         st.warning("La vista de refacciones final está vacía.")
         return pd.DataFrame()
-    
-    # Asegurar que las columnas clave sean numéricas para el degradado
-    cols_numericas = [
-        "venta_mostrador", "costo_mostrador", "venta_servicio_subref", 
-        "venta_total_combinada", "meta_mes", "pct_alcance_meta", "margen_pct_mostrador"
-    ]
-    for col in cols_numericas:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-            
+    # Los tipos numéricos ya vienen del esquema de la vista (schema_utils)
     return df
 
 
+# permitir_vacios: refacciones puede venir vacía de verdad; eso se cachea
+# igual. Una descarga fallida (frame_fallido) es una falla de la carga.
+@cache_swr(ttl=86400, vistas=[VISTA_VENTAS, VISTA_METAS, VISTA_REFACCIONES], permitir_vacios=True)
+def cargar_datos_ventas():
+    """Descarga en paralelo las tres vistas de la sección (cache 24h, stale-while-revalidate)."""
+    vistas = obtener_vistas(
+        [VISTA_VENTAS, VISTA_METAS, VISTA_REFACCIONES],
+        opciones=opciones_vistas_ventas()
+    )
+    fallidas = [nombre for nombre, df in vistas.items() if es_carga_fallida(df)]
+    if fallidas:
+        raise ValueError(f"No se pudieron descargar: {', '.join(fallidas)}")
+
+    return (
+        cargar_ventas_base(vistas[VISTA_VENTAS]),
+        cargar_meta_base(vistas[VISTA_METAS]),
+        cargar_detalle_refacciones_final(vistas[VISTA_REFACCIONES])
+    )
+
 
 
-@st.cache_data(ttl=86400)
-def preparar_fiscal_cacheado(df, df_meta):
-    anio_fiscal_actual = df["anio_fiscal_jd"].max()
 
-    df_fiscal = df[df["anio_fiscal_jd"] == anio_fiscal_actual]
-    df_meta_fiscal = df_meta[df_meta["anio_fiscal_jd"] == anio_fiscal_actual].copy()
+# Llave = versión de cargar_datos_ventas; los frames no se hashean
+@frame_compartido(ttl=86400)
+def preparar_fiscal_cacheado(_df, _df_meta, version):
+    anio_fiscal_actual = _df["anio_fiscal_jd"].max()
+
+    df_fiscal = _df[_df["anio_fiscal_jd"] == anio_fiscal_actual]
+    df_meta_fiscal = _df_meta[_df_meta["anio_fiscal_jd"] == anio_fiscal_actual]
 
     return df_fiscal, df_meta_fiscal, anio_fiscal_actual
 
 
 
-@st.cache_data(ttl=86400)
-def preparar_mensual(df_fiscal, df_meta_fiscal):
+# Misma agregación que _preparar_mensual_pandas (motor DuckDB opcional)
+SQL_MENSUAL = """
+WITH mensual AS (
+    SELECT anio_fiscal_jd, orden_mes_fiscal, periodo_jd,
+           SUM(venta_real) AS venta_real,
+           SUM(costo_real) AS costo_real,
+           SUM(utilidad_real) AS utilidad_real
+    FROM fiscal
+    WHERE periodo_jd IS NOT NULL
+    GROUP BY anio_fiscal_jd, orden_mes_fiscal, periodo_jd
+),
+meta_mensual AS (
+    SELECT periodo_jd, SUM(venta_real) AS venta_real, SUM(meta) AS meta
+    FROM meta_fiscal
+    WHERE periodo_jd IS NOT NULL
+    GROUP BY periodo_jd
+)
+SELECT m.anio_fiscal_jd, m.orden_mes_fiscal, m.periodo_jd,
+       m.venta_real, m.costo_real, m.utilidad_real,
+       CASE WHEN m.venta_real > 0 THEN m.utilidad_real / m.venta_real * 100 END AS margen_pct,
+       mm.meta,
+       CASE WHEN mm.meta > 0 THEN mm.venta_real / mm.meta * 100 END AS cumplimiento_meta_pct
+FROM mensual m
+LEFT JOIN meta_mensual mm ON m.periodo_jd = mm.periodo_jd
+ORDER BY m.orden_mes_fiscal
+"""
+
+
+@frame_compartido(ttl=86400)
+def preparar_mensual(_df_fiscal, _df_meta_fiscal, version):
+    return consulta(
+        "ventas.preparar_mensual",
+        lambda: _preparar_mensual_pandas(_df_fiscal, _df_meta_fiscal),
+        SQL_MENSUAL,
+        {"fiscal": _df_fiscal, "meta_fiscal": _df_meta_fiscal},
+    )
+
+
+def _preparar_mensual_pandas(df_fiscal, df_meta_fiscal):
     mensual = (
         df_fiscal
         .groupby(
@@ -204,8 +284,15 @@ def render_kpis(mensual, anio_fiscal_actual):
 
 
 
-def grafica_venta_vs_meta(mensual):
+def grafica_venta_vs_meta(mensual, version):
     st.subheader("Venta vs Meta por mes")
+    # mensual depende solo de la versión de datos: el spec se arma una vez
+    mostrar_altair_cacheado(
+        "ventas.venta_vs_meta", version, (), lambda: chart_venta_vs_meta(mensual)
+    )
+
+
+def chart_venta_vs_meta(mensual):
     grafica_df = mensual[[
         "periodo_jd",
         "venta_real",
@@ -258,7 +345,7 @@ def grafica_venta_vs_meta(mensual):
         .properties(height=420)
     )
 
-    st.altair_chart(chart, use_container_width=True)
+    return chart
 
 
 def tabla_ventas_mes_a_mes(mensual):
@@ -303,13 +390,16 @@ def tabla_ventas_mes_a_mes(mensual):
 
     
 
-def grafica_meta_horizontal(mensual):
+def grafica_meta_horizontal(mensual, version):
     st.subheader("Cumplimiento de meta global por mes")
+    mostrar_altair_cacheado(
+        "ventas.meta_horizontal", version, (), lambda: chart_meta_horizontal(mensual)
+    )
 
-    # Copiamos el DF mensual
-    grafica_mes = mensual.copy()
 
-    grafica_mes = grafica_mes[[
+def chart_meta_horizontal(mensual):
+    # La selección de columnas ya es un frame propio (Copy-on-Write)
+    grafica_mes = mensual[[
         "periodo_jd",
         "venta_real",
         "meta",
@@ -367,7 +457,7 @@ def grafica_meta_horizontal(mensual):
         .properties(height=max(320, len(grafica_mes) * 38))
     )
 
-    st.altair_chart(chart, use_container_width=True)
+    return chart
 
 
 def grafica_venta_sucursal_vs_meta(df_meta_fiscal):
@@ -449,18 +539,42 @@ def grafica_venta_sucursal_vs_meta(df_meta_fiscal):
     #return mensual_sucursal
 
 
-def matriz_ventas_sucursal(df_fiscal):
-    st.subheader("Venta mensual por sucursal")
+SQL_VENTAS_SUCURSAL_MES = """
+SELECT orden_mes_fiscal, periodo_jd, CAST(sucursal AS VARCHAR) AS sucursal,
+       SUM(venta_real) AS venta_real
+FROM fiscal
+WHERE periodo_jd IS NOT NULL AND sucursal IS NOT NULL
+GROUP BY orden_mes_fiscal, periodo_jd, sucursal
+"""
+
 
+def _ventas_sucursal_mes_pandas(df_fiscal):
     ventas_sucursal_mes = (
         df_fiscal
         .groupby(
             ["orden_mes_fiscal", "periodo_jd", "sucursal"],
-            as_index=False
+            as_index=False,
+            observed=True
         )
         .agg({"venta_real": "sum"})
     )
 
+    # Como texto para que el pivot no abra columnas de sucursales sin venta
+    ventas_sucursal_mes["sucursal"] = ventas_sucursal_mes["sucursal"].astype(str)
+    return ventas_sucursal_mes
+
+
+def matriz_ventas_sucursal(df_fiscal, version):
+    st.subheader("Venta mensual por sucursal")
+
+    ventas_sucursal_mes = consulta(
+        "ventas.matriz_ventas_sucursal",
+        lambda: _ventas_sucursal_mes_pandas(df_fiscal),
+        SQL_VENTAS_SUCURSAL_MES,
+        {"fiscal": df_fiscal},
+        ignorar_orden=True,  # el pivot reordena
+    )
+
     matriz = (
         ventas_sucursal_mes
         .pivot(
@@ -502,11 +616,42 @@ def matriz_ventas_sucursal(df_fiscal):
         data_columns=data_columns,
         header_right=["Total"],
         footer_totals=footer_totals,
-        max_height=520
+        max_height=520,
+        version_datos=version  # la matriz solo depende de df_fiscal
     )
 
 
 
+# IS NOT DISTINCT FROM: pandas también empareja sucursal_id nulos en el merge
+SQL_REALES_VS_META_MES = """
+WITH meta_mes AS (
+    SELECT sucursal_id, meta, porcentaje_cumplimiento, semaforo
+    FROM meta_fiscal
+    WHERE periodo_jd = $1
+)
+SELECT f.*, m.meta, m.porcentaje_cumplimiento, m.semaforo
+FROM fiscal f
+LEFT JOIN meta_mes m ON f.sucursal_id IS NOT DISTINCT FROM m.sucursal_id
+WHERE f.periodo_jd = $1
+"""
+
+
+def _reales_vs_meta_mes_pandas(df_fiscal, df_meta_fiscal, periodo_sel):
+    df_mes = df_fiscal[df_fiscal["periodo_jd"] == periodo_sel]
+    df_meta_mes = df_meta_fiscal[df_meta_fiscal["periodo_jd"] == periodo_sel]
+
+    return df_mes.merge(
+        df_meta_mes[[
+            "sucursal_id",
+            "meta",
+            "porcentaje_cumplimiento",
+            "semaforo"
+        ]],
+        on="sucursal_id",
+        how="left"
+    )
+
+
 def detalle_sucursal_por_mes(df_fiscal, df_meta_fiscal):
     st.subheader("Desempeño por sucursal ")
 
@@ -529,31 +674,15 @@ def detalle_sucursal_por_mes(df_fiscal, df_meta_fiscal):
     st.markdown("<br>", unsafe_allow_html=True)
 
     # -------------------------------
-    # FILTRO POR MES
+    # FILTRO POR MES + MERGE REALES + META
     # -------------------------------
-    df_mes = df_fiscal[
-        df_fiscal["periodo_jd"] == periodo_sel
-    ].copy()
-
-    df_meta_mes = df_meta_fiscal[
-        df_meta_fiscal["periodo_jd"] == periodo_sel
-    ].copy()
-
-    # -------------------------------
-    # MERGE REALES + META
-    # -------------------------------
-    tabla_sucursal = (
-        df_mes
-        .merge(
-            df_meta_mes[[
-                "sucursal_id",
-                "meta",
-                "porcentaje_cumplimiento",
-                "semaforo"
-            ]],
-            on="sucursal_id",
-            how="left"
-        )
+    tabla_sucursal = consulta(
+        "ventas.detalle_sucursal_por_mes",
+        lambda: _reales_vs_meta_mes_pandas(df_fiscal, df_meta_fiscal, periodo_sel),
+        SQL_REALES_VS_META_MES,
+        {"fiscal": df_fiscal, "meta_fiscal": df_meta_fiscal},
+        parametros=[periodo_sel],
+        ignorar_orden=True,  # la tabla y la gráfica ordenan después
     )
 
     # -------------------------------
@@ -579,9 +708,9 @@ def detalle_sucursal_por_mes(df_fiscal, df_meta_fiscal):
         "semaforo": "Semáforo"
     })
 
-    # Aseguramos tipos numéricos
-    for col in ["Venta", "Costo", "Utilidad", "Margen %", "Meta", "% Cumplimiento"]:
-        tabla[col] = pd.to_numeric(tabla[col], errors="coerce").fillna(0)
+    # Los tipos ya vienen del esquema; solo rellenamos sucursales sin meta
+    cols_numericas = ["Venta", "Costo", "Utilidad", "Margen %", "Meta", "% Cumplimiento"]
+    tabla[cols_numericas] = tabla[cols_numericas].fillna(0)
 
     # Orden opcional (por venta o cumplimiento)
     tabla = tabla.sort_values("Venta", ascending=False)
@@ -700,7 +829,7 @@ def mostrar_detalle_refacciones_mes(df_refacciones, periodo_seleccionado):
     st.subheader(f"Detalle con servicio - {periodo_seleccionado}")
     
     # 1. Filtrar por el mes seleccionado
-    df_mes = df_refacciones[df_refacciones["periodo_jd"] == periodo_seleccionado].copy()
+    df_mes = df_refacciones[df_refacciones["periodo_jd"] == periodo_seleccionado]
     
     if df_mes.empty:
         st.info(f"No hay datos de refacciones para el periodo {periodo_seleccionado}")
@@ -751,19 +880,18 @@ def mostrar_detalle_refacciones_mes(df_refacciones, periodo_seleccionado):
 def mostrar(config):
     st.title("Ventas")
     render_descripcion()
+    mostrar_indicador_refresco(cargar_datos_ventas)
 
     # 🔥 DATA BASE (cacheado 24h)
-    df_base = cargar_ventas_base()
-    df_meta = cargar_meta_base()
-    df_refacciones_base = cargar_detalle_refacciones_final()
+    (df_base, df_meta, df_refacciones_base), version = cargar_datos_ventas.con_version()
 
-    # 🔥 DATA FISCAL (cacheado 24h)
+    # 🔥 DATA FISCAL (cacheado por versión de datos)
     df_fiscal, df_meta_fiscal, anio_fiscal_actual = preparar_fiscal_cacheado(
-        df_base, df_meta
+        df_base, df_meta, version
     )
 
-    # 🔥 DATA MENSUAL (cacheado 24h)
-    mensual = preparar_mensual(df_fiscal, df_meta_fiscal)
+    # 🔥 DATA MENSUAL (cacheado por versión de datos)
+    mensual = preparar_mensual(df_fiscal, df_meta_fiscal, version)
 
     # -----------------------------
     # KPIs
@@ -774,10 +902,10 @@ def mostrar(config):
     # -----------------------------
     # GRÁFICAS Y TABLAS
     # -----------------------------
-    grafica_venta_vs_meta(mensual)
+    grafica_venta_vs_meta(mensual, version)
     tabla_ventas_mes_a_mes(mensual)
-    grafica_meta_horizontal(mensual)
-    matriz_ventas_sucursal(df_fiscal)
+    grafica_meta_horizontal(mensual, version)
+    matriz_ventas_sucursal(df_fiscal, version)
     grafica_venta_sucursal_vs_meta(df_meta_fiscal)
 
     tabla_sucursal, periodo_sel = detalle_sucursal_por_mes(
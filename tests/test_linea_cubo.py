@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from secciones.linea import _agregar_con_totales, consultar_cubo, MEDIDAS_PROVEEDOR
+
+
+def _vista_proveedores():
+    return pd.DataFrame({
+        "anio": [2025, 2025, 2025, 2025],
+        "mes": [1, 1, 2, 2],
+        "mes_nombre": ["Enero", "Enero", "Febrero", "Febrero"],
+        "periodo_jd": ["2025-01", "2025-01", "2025-02", "2025-02"],
+        "linea": ["AG", "AG", "AG", "CONST"],
+        "sucursal": ["NORTE", "SUR", "NORTE", "SUR"],
+        "Proveedor": ["DEERE", None, "DEERE", "STIHL"],
+        "venta_real": [100.0, 50.0, 30.0, 20.0],
+        "costo_real": [80.0, 40.0, 20.0, 10.0],
+        "utilidad_real": [20.0, 10.0, 10.0, 10.0],
+        "margen_real": [20.0, 20.0, np.nan, 50.0],
+    })
+
+
+def _cubo_proveedores(df):
+    return _agregar_con_totales(
+        df, ["anio", "mes_nombre", "linea", "sucursal", "Proveedor"], MEDIDAS_PROVEEDOR
+    )
+
+
+def test_desglose_por_proveedor_excluye_nulos_como_el_groupby():
+    df = _vista_proveedores()
+    cubo = _cubo_proveedores(df)
+
+    desglose = consultar_cubo(cubo, anio=2025, mes_nombre="TODOS", linea="TODAS", sucursal="TODAS")
+    esperado = df.groupby("Proveedor")["venta_real"].sum()
+
+    obtenido = desglose.set_index("Proveedor")["venta_real"].sort_index()
+    pd.testing.assert_series_equal(obtenido, esperado.sort_index(), check_names=False, check_index_type=False)
+    assert "nan" not in set(desglose["Proveedor"])
+
+
+def test_totales_incluyen_filas_con_nivel_nulo():
+    df = _vista_proveedores().drop(columns="Proveedor").assign(meta_sucursal_linea=0.0)
+    df.loc[3, "sucursal"] = None
+    cubo = _agregar_con_totales(
+        df, ["anio", "mes_nombre", "linea", "sucursal"], MEDIDAS_PROVEEDOR + ["meta_sucursal_linea"]
+    )
+
+    # El desglose por sucursal deja fuera la fila sin sucursal…
+    por_sucursal = consultar_cubo(cubo, anio=2025, mes_nombre="TODOS", linea="TODAS")
+    esperado = df.groupby("sucursal")["venta_real"].sum()
+    obtenido = por_sucursal.set_index("sucursal")["venta_real"].sort_index()
+    pd.testing.assert_series_equal(obtenido, esperado.sort_index(), check_names=False, check_index_type=False)
+
+    # …pero el total de sucursales la incluye, como el filtro + suma original
+    total = consultar_cubo(cubo, anio=2025, mes_nombre="TODOS", linea="TODAS", sucursal="TODAS")
+    assert total["venta_real"].sum() == df["venta_real"].sum()
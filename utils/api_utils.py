@@ -1,11 +1,46 @@
 # utils/api_utils.py
 
+import os
+import json
+import time
+import hashlib
+import logging
+import operator
+import threading
 import requests
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from datetime import datetime
 from babel.dates import format_datetime
 
+from utils.cache_utils import (
+    leer_snapshot,
+    guardar_snapshot,
+    leer_particiones,
+    guardar_particiones,
+    clave_periodo,
+    single_flight,
+    frame_fallido
+)
+from utils.schema_utils import aplicar_esquema, firma_esquema, codificar_dimensiones_vista
+
+try:
+    import ijson
+except ImportError:  # sin ijson se usa la ruta clásica response.json()
+    ijson = None
+
+try:
+    import resource
+except ImportError:  # Windows no tiene el módulo resource
+    resource = None
+
+
+logger = logging.getLogger(__name__)
+
 
 # =========================================================
 # FUNCIÓN PARA OBTENER HEADERS (SECRETS SEGUROS)
@@ -20,35 +55,514 @@ def _get_api_config():
         },
         "API_BASE_LEGACY": api_secrets["API_BASE"],
         "API_TOKEN_LEGACY": api_secrets["API_TOKEN"],
+        # La API acepta select= y filtros por columna en la query string
+        "PUSHDOWN": bool(api_secrets.get("SOPORTA_FILTROS", False)),
     }
 
 
+# =========================================================
+# SESIÓN HTTP COMPARTIDA (POOL + REINTENTOS)
+# =========================================================
+# Timeouts (conexión, lectura) en segundos. Las vistas de detalle
+# tardan bastante más en llegar que el resto.
+TIMEOUT_DEFAULT = (5, 60)
+TIMEOUT_FECHA = (5, 10)
+TIMEOUTS_VISTAS = {
+    "vw_dashboard_comercial_refacciones_final": (5, 180),
+    "vw_dashboard_ubicacion_clientes_mes": (5, 180),
+}
+
+
+@st.cache_resource(show_spinner=False)
+def _get_session() -> requests.Session:
+    """
+    Una sola sesión por proceso: reutiliza conexiones keep-alive (sin
+    handshake TCP+TLS por petición) y reintenta errores transitorios con
+    backoff exponencial + jitter. El pool de urllib3 es thread-safe.
+    """
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=2,
+        backoff_factor=0.5,
+        backoff_jitter=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False  # el último status lo valida raise_for_status()
+    )
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# =========================================================
+# SERVICIO DE FRESCURA (FECHA DEL ÚLTIMO ETL)
+# =========================================================
+# Un hilo por proceso consulta /ultima_actualizacion cada
+# INTERVALO_FRESCURA segundos (configurable en secrets: api.INTERVALO_FRESCURA).
+# La fecha del sidebar y la versión de los caches se leen de ese estado,
+# así ningún rerun hace I/O de red para saber si hay datos nuevos.
+INTERVALO_FRESCURA_DEFAULT = 300
+ESPERA_PRIMER_SONDEO = 3
+
+
+def _consultar_ultima_actualizacion() -> dict | None:
+    try:
+        # La config va dentro del try: un secret faltante no debe tumbar el hilo de sondeo
+        config = _get_api_config()
+
+        url = f"{config['API_BASE_LEGACY']}/ultima_actualizacion"
+        headers = {
+            "Authorization": f"Bearer {config['API_TOKEN_LEGACY']}"
+        }
+
+        response = _get_session().get(url, headers=headers, timeout=TIMEOUT_FECHA)
+        response.raise_for_status()
+        return response.json()
+    except Exception:
+        return None
+
+
+@st.cache_resource(show_spinner=False)
+def _servicio_frescura() -> dict:
+    intervalo = float(st.secrets["api"].get("INTERVALO_FRESCURA", INTERVALO_FRESCURA_DEFAULT))
+    estado = {"dato": None, "consultado": None, "listo": threading.Event()}
+
+    def _sondear():
+        while True:
+            try:
+                dato = _consultar_ultima_actualizacion()
+                # Si la API legacy falla se conserva la última fecha conocida
+                if dato is not None:
+                    estado["dato"] = dato
+                estado["consultado"] = datetime.now()
+            except Exception:
+                logger.exception("Falló el sondeo de /ultima_actualizacion")
+            finally:
+                # Aunque falle, nadie debe quedarse esperando el primer sondeo
+                estado["listo"].set()
+            time.sleep(intervalo)
+
+    threading.Thread(target=_sondear, name="sondeo-frescura", daemon=True).start()
+    return estado
+
+
+def obtener_ultima_actualizacion(espera: float = 0) -> dict | None:
+    """Último resultado de /ultima_actualizacion, sin tocar la red."""
+    estado = _servicio_frescura()
+    if espera:
+        # Solo bloquea al arrancar el proceso, mientras llega el primer sondeo
+        estado["listo"].wait(espera)
+    return estado["dato"]
+
+
+def obtener_version_datos() -> str | None:
+    """Fecha del último ETL, usada como versión de snapshots y caches."""
+    data = obtener_ultima_actualizacion(espera=ESPERA_PRIMER_SONDEO)
+    return data.get("fecha") if data else None
+
+
+# =========================================================
+# INGESTA EN STREAMING (JSON → BLOQUES COLUMNARES)
+# =========================================================
+# En lugar de response.json() + pd.DataFrame(lista_de_dicts), el cuerpo
+# se decodifica objeto por objeto y se acumula por columnas. Cada
+# FILAS_POR_BLOQUE filas el bloque se convierte en un DataFrame tipado,
+# así nunca coexisten el cuerpo completo, la lista de dicts y el frame.
+FILAS_POR_BLOQUE = 50_000
+
+# Última medición por vista: filas, MB del frame, segundos y el RSS
+# actual del proceso antes/después de la descarga (delta por vista)
+METRICAS_INGESTA = {}
+
+
+def _bloque_a_dataframe(columnas: dict) -> pd.DataFrame:
+    # pd.Series infiere el dtype (int64 / float64 / object) por columna
+    return pd.DataFrame({col: pd.Series(valores) for col, valores in columnas.items()})
+
+
+def _leer_json_por_bloques(flujo) -> pd.DataFrame:
+    bloques = []
+    columnas = {}
+    filas = 0
+
+    for registro in ijson.items(flujo, "item", use_float=True):
+        for col, valor in registro.items():
+            if col not in columnas:
+                # Columna nueva a mitad del bloque: se rellena hacia atrás
+                columnas[col] = [None] * filas
+            columnas[col].append(valor)
+        filas += 1
+
+        # Columnas ausentes en este registro
+        if len(registro) != len(columnas):
+            for valores in columnas.values():
+                if len(valores) < filas:
+                    valores.append(None)
+
+        if filas == FILAS_POR_BLOQUE:
+            bloques.append(_bloque_a_dataframe(columnas))
+            columnas = {col: [] for col in columnas}
+            filas = 0
+
+    if filas:
+        bloques.append(_bloque_a_dataframe(columnas))
+
+    if not bloques:
+        return pd.DataFrame()
+    if len(bloques) == 1:
+        return bloques[0]
+    return pd.concat(bloques, ignore_index=True)
+
+
+def _rss_maximo_proceso_mb() -> float | None:
+    """Marca máxima de RSS del proceso desde que arrancó (ru_maxrss, KB en Linux)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _rss_actual_mb() -> float | None:
+    """RSS actual del proceso (/proc/self/statm, solo Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas_residentes = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return paginas_residentes * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+
+def _registrar_metricas_ingesta(nombre_vista, df, inicio, rss_inicio):
+    rss_fin = _rss_actual_mb()
+    rss_maximo = _rss_maximo_proceso_mb()
+    metricas = {
+        "filas": len(df),
+        "mb_frame": round(df.memory_usage(deep=True).sum() / 1024 ** 2, 2),
+        # RSS actual antes/después: lo que esta vista deja en memoria. No ve
+        # el pico transitorio del parseo y, con descargas en paralelo,
+        # incluye lo que crecieron las demás en el mismo lapso
+        "rss_inicio_mb": round(rss_inicio, 1) if rss_inicio is not None else None,
+        "rss_fin_mb": round(rss_fin, 1) if rss_fin is not None else None,
+        "rss_incremento_mb": (
+            round(rss_fin - rss_inicio, 1) if rss_fin is not None and rss_inicio is not None else None
+        ),
+        # Máximo histórico de todo el proceso (no es de esta vista)
+        "rss_maximo_proceso_mb": round(rss_maximo, 1) if rss_maximo is not None else None,
+        "segundos": round(time.perf_counter() - inicio, 2),
+        "streaming": ijson is not None,
+    }
+    METRICAS_INGESTA[nombre_vista] = metricas
+    logger.info("Ingesta %s: %s", nombre_vista, metricas)
+
+
+# =========================================================
+# FILTROS Y PROYECCIÓN DE COLUMNAS (PUSHDOWN)
+# =========================================================
+# filtros = {"anio": 2026}                      → igualdad
+#           {"sucursal": ["MERIDA", "CANCUN"]}  → pertenencia
+#           {"anio_fiscal_jd": (">=", 2025)}    → comparación
+# Si la API los soporta viajan en la query string (estilo PostgREST:
+# select=a,b&anio=eq.2026); si no, se aplican igual en local.
+_OPERADORES = {
+    "==": (operator.eq, "eq"),
+    "!=": (operator.ne, "neq"),
+    ">": (operator.gt, "gt"),
+    ">=": (operator.ge, "gte"),
+    "<": (operator.lt, "lt"),
+    "<=": (operator.le, "lte"),
+}
+
+
+def _normalizar_filtro(valor):
+    if isinstance(valor, tuple):
+        return valor
+    if isinstance(valor, (list, set, frozenset)):
+        return "in", list(valor)
+    return "==", valor
+
+
+def _parametros_pushdown(columnas=None, filtros=None) -> dict:
+    params = {}
+    if columnas:
+        params["select"] = ",".join(columnas)
+
+    for col, valor in (filtros or {}).items():
+        op, v = _normalizar_filtro(valor)
+        if op == "in":
+            params[col] = "in.(" + ",".join(str(x) for x in v) + ")"
+        else:
+            params[col] = f"{_OPERADORES[op][1]}.{v}"
+
+    return params
+
+
+def _filtrar_local(
+    df: pd.DataFrame,
+    columnas=None,
+    filtros=None,
+    filtrado_en_api: bool = False
+) -> pd.DataFrame:
+    """
+    Aplica columnas/filtros en local. Un filtro sobre una columna que no
+    existe es un error (typo o cambio de esquema), salvo con
+    filtrado_en_api=True: la API ya aplicó el filtro y no regresa la
+    columna si no viene en select.
+    """
+    if df.empty:
+        return df
+
+    if filtros:
+        faltantes = [col for col in filtros if col not in df.columns]
+        if faltantes and not filtrado_en_api:
+            raise KeyError(f"Filtro sobre columnas inexistentes: {faltantes}")
+        if faltantes:
+            logger.debug("Filtros %s ya aplicados por la API (columnas no regresadas)", faltantes)
+
+        mask = pd.Series(True, index=df.index)
+        for col, valor in filtros.items():
+            if col not in df.columns:
+                continue
+            op, v = _normalizar_filtro(valor)
+            if op == "in":
+                mask &= df[col].isin(v)
+            else:
+                mask &= _OPERADORES[op][0](df[col], v)
+        df = df[mask]
+
+    if columnas:
+        df = df[[c for c in columnas if c in df.columns]]
+
+    return df
+
+
+def _clave_snapshot(nombre_vista: str, columnas=None, filtros=None) -> str:
+    if not columnas and not filtros:
+        return nombre_vista
+    consulta = json.dumps({"c": columnas, "f": filtros}, sort_keys=True, default=str)
+    return f"{nombre_vista}__{hashlib.md5(consulta.encode('utf-8')).hexdigest()[:8]}"
+
+
 # =========================================================
 # FUNCIÓN GENÉRICA PARA OBTENER CUALQUIER VISTA
 # =========================================================
-#@st.cache_data(ttl=86400, show_spinner="Cargando datos diarios...")
-def obtener_vista(nombre_vista: str) -> pd.DataFrame:
+def _descargar_vista(nombre_vista: str, params: dict = None, origen: str = None) -> pd.DataFrame:
     config = _get_api_config()
     url = f"{config['API_BASE']}/api/view/{nombre_vista}"
 
-    try:
-        response = requests.get(
-            url,
-            headers=config["HEADERS"],
-            timeout=120  # ⬅️ mejor menor
-        )
+    inicio = time.perf_counter()
+    rss_inicio = _rss_actual_mb()
+
+    with _get_session().get(
+        url,
+        headers=config["HEADERS"],
+        params=params,
+        timeout=TIMEOUTS_VISTAS.get(nombre_vista, TIMEOUT_DEFAULT),
+        stream=True
+    ) as response:
         response.raise_for_status()
-        data = response.json()
 
-        return pd.DataFrame(data) if data else pd.DataFrame()
+        if ijson is not None:
+            # Descomprime gzip/deflate al vuelo mientras ijson lee
+            response.raw.decode_content = True
+            df = _leer_json_por_bloques(response.raw)
+        else:
+            data = response.json()
+            df = pd.DataFrame(data) if data else pd.DataFrame()
+
+    # Tipos declarados en schema_utils: el snapshot ya queda tipado
+    df = aplicar_esquema(df, nombre_vista, origen)
+
+    _registrar_metricas_ingesta(nombre_vista, df, inicio, rss_inicio)
+    return df
+
+
+def _version_snapshot(nombre_vista: str) -> str | None:
+    # Se invalida cuando corre el ETL o cuando cambia el esquema de tipos
+    version = obtener_version_datos()
+    return f"{version}|{firma_esquema(nombre_vista)}" if version else None
+
+
+def _cargar_vista(nombre_vista, clave, version, columnas=None, filtros=None) -> pd.DataFrame:
+    # 1. Snapshot local vigente
+    df = leer_snapshot(clave, version)
+    if df is not None:
+        # El parquet trae su propio diccionario; se alinea al catálogo compartido
+        return codificar_dimensiones_vista(df, nombre_vista, clave)
+
+    # 2. Descarga desde la API (solo lo que la página va a usar)
+    try:
+        df = _descargar_vista(nombre_vista, _parametros_pushdown(columnas, filtros), origen=clave)
 
     except requests.exceptions.Timeout:
         st.error(f"⏱️ Timeout al consultar {nombre_vista}")
-        return pd.DataFrame()
+        return frame_fallido()
 
     except Exception as e:
         st.error(f"❌ Error al cargar la vista {nombre_vista}: {e}")
-        return pd.DataFrame()
+        return frame_fallido()
+
+    # Por si la API ignora algún filtro, el resultado es el mismo
+    df = _filtrar_local(df, columnas, filtros, filtrado_en_api=True)
+
+    guardar_snapshot(clave, version, df)
+    return df
+
+
+#@st.cache_data(ttl=86400, show_spinner="Cargando datos diarios...")
+def obtener_vista(nombre_vista: str, columnas: list = None, filtros: dict = None) -> pd.DataFrame:
+    # Las llamadas simultáneas a la misma vista y versión comparten una
+    # sola carga (single_flight). Se regresa una copia superficial para
+    # que una sección que agregue columnas no afecte a las demás.
+    version = _version_snapshot(nombre_vista)
+
+    if nombre_vista in VISTAS_INCREMENTALES:
+        # Historial particionado por periodo: el recorte se hace en local
+        df = single_flight(
+            (nombre_vista, version),
+            _obtener_vista_incremental,
+            nombre_vista
+        )
+        return _filtrar_local(df, columnas, filtros).copy(deep=False)
+
+    if (columnas or filtros) and not _get_api_config()["PUSHDOWN"]:
+        # La API no filtra: se reutiliza la vista completa y se recorta aquí
+        return _filtrar_local(obtener_vista(nombre_vista), columnas, filtros)
+
+    clave = _clave_snapshot(nombre_vista, columnas, filtros)
+    df = single_flight(
+        (clave, version),
+        _cargar_vista,
+        nombre_vista, clave, version, columnas, filtros
+    )
+    return df.copy(deep=False)
+
+
+# =========================================================
+# REFRESCO INCREMENTAL DE VISTAS MENSUALES
+# =========================================================
+# Vista → columnas (año, mes) que definen el periodo. Después de cada
+# ETL solo se vuelven a pedir los últimos PERIODOS_ABIERTOS periodos
+# (el mes abierto y el anterior, que aún recibe ajustes) y se mezclan
+# con las particiones cerradas que ya están en disco.
+VISTAS_INCREMENTALES = {
+    "vw_facturacion_sucursal_mes_jd": ("anio_fiscal_jd", "orden_mes_fiscal"),
+    "vw_dashboard_meta_vendedor_jd": ("anio", "mes"),
+}
+PERIODOS_ABIERTOS = 2
+
+
+def _obtener_vista_incremental(nombre_vista: str) -> pd.DataFrame:
+    columnas_periodo = VISTAS_INCREMENTALES[nombre_vista]
+    version = _version_snapshot(nombre_vista)
+    firma = firma_esquema(nombre_vista)
+
+    meta, df_cache = leer_particiones(nombre_vista)
+    if df_cache is not None and version and meta.get("version") == version:
+        return aplicar_esquema(df_cache, nombre_vista)
+
+    # Sin historial, con otro esquema o sin filtros en la API → descarga completa
+    delta = (
+        df_cache is not None
+        and meta.get("esquema") == firma
+        and _get_api_config()["PUSHDOWN"]
+    )
+
+    try:
+        if delta:
+            periodos = meta["particiones"]
+            corte = periodos[-PERIODOS_ABIERTOS] if len(periodos) >= PERIODOS_ABIERTOS else periodos[0]
+
+            # La API filtra por año; el corte exacto por mes se hace aquí
+            df_nuevo = _descargar_vista(
+                nombre_vista,
+                _parametros_pushdown(filtros={columnas_periodo[0]: (">=", corte // 100)})
+            )
+            if not df_nuevo.empty:
+                df_nuevo = df_nuevo[clave_periodo(df_nuevo, columnas_periodo) >= corte]
+
+            if df_nuevo.empty:
+                # Sin filas en los periodos abiertos (o un pushdown que regresó
+                # vacío en lugar de fallar): escribir borraría las particiones
+                # abiertas del disco y marcaría el historial recortado como
+                # vigente. Se sirve el historial anterior sin tocar el disco;
+                # el siguiente ETL vuelve a intentar el delta.
+                logger.warning("Delta vacío para %s; se conserva el historial en disco", nombre_vista)
+                return aplicar_esquema(df_cache, nombre_vista)
+
+            cerrados = [p for p in periodos if p < corte]
+            df_cerrado = df_cache[clave_periodo(df_cache, columnas_periodo) < corte]
+            # Re-aplicar el esquema unifica categorías entre particiones
+            df = aplicar_esquema(pd.concat([df_cerrado, df_nuevo], ignore_index=True), nombre_vista)
+        else:
+            cerrados = []
+            df_nuevo = df = _descargar_vista(nombre_vista)
+
+    except Exception as e:
+        if df_cache is not None:
+            # Mejor datos de ayer que una página vacía
+            st.warning(f"⚠️ No se pudo actualizar {nombre_vista}, se muestran datos en cache")
+            return aplicar_esquema(df_cache, nombre_vista)
+        st.error(f"❌ Error al cargar la vista {nombre_vista}: {e}")
+        return frame_fallido()
+
+    if version and not df.empty:
+        guardar_particiones(
+            nombre_vista,
+            df_nuevo,
+            columnas_periodo,
+            meta={"version": version, "esquema": firma},
+            conservar=cerrados
+        )
+
+    return df
+
+
+# =========================================================
+# DESCARGA EN PARALELO DE VARIAS VISTAS
+# =========================================================
+MAX_DESCARGAS_PARALELAS = 4
+
+
+def obtener_vistas(
+    nombres_vistas: list,
+    opciones: dict = None,
+    max_workers: int = MAX_DESCARGAS_PARALELAS
+) -> dict:
+    """
+    Descarga varias vistas al mismo tiempo y las regresa en un dict
+    {nombre_vista: DataFrame} con el mismo orden de entrada. En frío, la
+    página tarda lo que la vista más lenta y no la suma de todas.
+    opciones = {nombre_vista: {"columnas": [...], "filtros": {...}}}
+    """
+    opciones = opciones or {}
+    nombres = list(dict.fromkeys(nombres_vistas))
+    if not nombres:
+        return {}
+
+    # Arranca el servicio de frescura (y espera su primer sondeo) una
+    # sola vez antes de repartir las vistas entre los hilos
+    obtener_version_datos()
+
+    # Los hilos del pool heredan el contexto de la sesión para que
+    # st.error / st.cache_* funcionen igual que en el hilo principal
+    ctx = get_script_run_ctx()
+
+    def _tarea(nombre_vista):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return obtener_vista(nombre_vista, **opciones.get(nombre_vista, {}))
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(nombres))) as pool:
+        resultados = list(pool.map(_tarea, nombres))
+
+    return dict(zip(nombres, resultados))
 
 
 
@@ -56,18 +570,18 @@ def obtener_vista(nombre_vista: str) -> pd.DataFrame:
 # FECHA DE ACTUALIZACIÓN (API LEGACY)
 # =========================================================
 def mostrar_fecha_actualizacion():
-    config = _get_api_config()
+    # Se lee del servicio de frescura: ningún rerun espera a la API legacy
+    estado = _servicio_frescura()
+    data = estado["dato"]
 
-    url = f"{config['API_BASE_LEGACY']}/ultima_actualizacion"
-    headers = {
-        "Authorization": f"Bearer {config['API_TOKEN_LEGACY']}"
-    }
+    if data is None:
+        if not estado["listo"].is_set():
+            st.caption("Consultando fecha de actualización…")
+        else:
+            st.warning("No se pudo obtener la fecha de actualización")
+        return
 
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
         fecha_dt = datetime.fromisoformat(data["fecha"])
 
         fecha_formateada = format_datetime(
@@ -92,4 +606,3 @@ def mostrar_fecha_actualizacion():
 
     except Exception:
         st.warning("No se pudo obtener la fecha de actualización")
-
@@ -0,0 +1,218 @@
+# utils/bench_utils.py
+#
+# Benchmarks de las rutas calientes del dashboard con datos sintéticos.
+# Se corren desde la raíz del proyecto:
+#
+#     python -m utils.bench_utils
+#
+# No llaman a la API ni necesitan una sesión de Streamlit.
+
+import re
+import time
+import numpy as np
+import pandas as pd
+
+from utils.indice_utils import indexar_por, seleccionar
+from utils.table_utils import construir_tabla_matriz_html, ESTILOS_TABLAS
+
+
+MESES = [
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+    "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
+]
+
+
+# =========================================================
+# DATOS SINTÉTICOS
+# =========================================================
+def frame_sintetico_linea(filas: int, semilla: int = 0) -> pd.DataFrame:
+    """Frame con la forma de las vistas de línea (tipos como los deja schema_utils)."""
+    rng = np.random.default_rng(semilla)
+    lineas = [f"LINEA {i:02d}" for i in range(12)]
+    sucursales = [f"SUCURSAL {i:02d}" for i in range(15)]
+
+    return pd.DataFrame({
+        "anio": rng.integers(2022, 2027, filas).astype("int32"),
+        "mes_nombre": pd.Categorical(rng.choice(MESES, filas), categories=MESES),
+        "linea": pd.Categorical(rng.choice(lineas, filas), categories=lineas),
+        "sucursal": pd.Categorical(rng.choice(sucursales, filas), categories=sucursales),
+        "venta_real": rng.gamma(2.0, 5_000.0, filas),
+        "utilidad_real": rng.gamma(2.0, 800.0, filas),
+    })
+
+
+def _filtrar_con_mascaras(df, linea, anio, mes, sucursal):
+    # Ruta anterior de linea.filtrar_datos: una máscara por selector
+    mask = (df["anio"] == anio)
+    if linea != "TODAS":
+        mask = mask & (df["linea"] == linea)
+    if mes != "TODOS":
+        mask = mask & (df["mes_nombre"] == mes)
+    if sucursal != "TODAS":
+        mask = mask & (df["sucursal"] == sucursal)
+    return df[mask]
+
+
+def _medir_ms(funcion, repeticiones: int) -> float:
+    """Mediana en milisegundos de `repeticiones` llamadas."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return float(np.median(tiempos))
+
+
+# =========================================================
+# FILTRADO: MÁSCARAS VS MULTIINDEX ORDENADO
+# =========================================================
+def bench_filtrado(tamanos=(10_000, 100_000, 1_000_000), repeticiones: int = 20) -> pd.DataFrame:
+    """Latencia de una selección típica (año + mes + sucursal) según el número de filas."""
+    llaves = ("anio", "mes_nombre", "linea", "sucursal")
+    seleccion = dict(linea="TODAS", anio=2025, mes="Marzo", sucursal="SUCURSAL 03")
+
+    resultados = []
+    for filas in tamanos:
+        df = frame_sintetico_linea(filas)
+
+        inicio = time.perf_counter()
+        df_idx = indexar_por(df, llaves)
+        indexado_ms = (time.perf_counter() - inicio) * 1000
+
+        # Las dos rutas deben regresar las mismas filas
+        esperado = _filtrar_con_mascaras(df, **seleccion)
+        obtenido = seleccionar(
+            df_idx, anio=seleccion["anio"], mes_nombre=seleccion["mes"],
+            linea=seleccion["linea"], sucursal=seleccion["sucursal"]
+        )
+        assert len(esperado) == len(obtenido)
+        assert np.isclose(esperado["venta_real"].sum(), obtenido["venta_real"].sum())
+
+        mascaras_ms = _medir_ms(lambda: _filtrar_con_mascaras(df, **seleccion), repeticiones)
+        indice_ms = _medir_ms(
+            lambda: seleccionar(
+                df_idx, anio=seleccion["anio"], mes_nombre=seleccion["mes"],
+                linea=seleccion["linea"], sucursal=seleccion["sucursal"]
+            ),
+            repeticiones
+        )
+
+        resultados.append({
+            "filas": filas,
+            "mascaras_ms": round(mascaras_ms, 3),
+            "indice_ms": round(indice_ms, 3),
+            "aceleracion": round(mascaras_ms / indice_ms, 1) if indice_ms else None,
+            "indexado_unico_ms": round(indexado_ms, 1),
+        })
+
+    return pd.DataFrame(resultados)
+
+
+# =========================================================
+# TABLA MATRIZ HTML: iterrows + ESTILOS EN LÍNEA VS POR COLUMNA + CLASES
+# =========================================================
+def matriz_sintetica(meses: int, sucursales: int, semilla: int = 0) -> pd.DataFrame:
+    """Matriz mes × sucursal como la de ventas.matriz_ventas_sucursal (con algunos nulos)."""
+    rng = np.random.default_rng(semilla)
+    datos = rng.gamma(2.0, 250_000.0, (meses, sucursales))
+    datos[rng.random((meses, sucursales)) < 0.02] = np.nan
+
+    df = pd.DataFrame(datos, columns=[f"SUCURSAL {i:03d}" for i in range(sucursales)])
+    df.insert(0, "Mes", [f"MES {i:03d}" for i in range(meses)])
+    df["Total"] = df.iloc[:, 1:].sum(axis=1)
+    return df
+
+
+def _cuerpo_matriz_referencia(df, header_left, data_columns, header_right, footer_totals):
+    # Cuerpo que armaba la versión con iterrows + get_color por celda
+    # (un style="background-color: rgb(...)" en cada <td>)
+    valores = df[data_columns].values.flatten()
+    valores = valores[~pd.isna(valores)].astype(float)
+    min_val = valores.min() if valores.size > 0 else 0
+    max_val = valores.max() if valores.size > 0 else 1
+
+    def get_color(val):
+        if pd.isna(val): return "background-color: #ffffff; color: #0B083D;"
+        ratio = (float(val) - min_val) / (max_val - min_val) if max_val != min_val else 0
+        r = int(227 + ratio * (21 - 227))
+        g = int(242 + ratio * (101 - 242))
+        b = int(253 + ratio * (192 - 253))
+        text_color = "white" if ratio > 0.6 else "#0B083D"
+        return f"background-color: rgb({r},{g},{b}); color: {text_color};"
+
+    html = ""
+    for _, row in df.iterrows():
+        html += "<tr>"
+        for col in df.columns:
+            val = row[col]
+            clase = ""
+            if col in header_left: clase = "sticky-left"
+            elif col in header_right: clase = "sticky-right"
+
+            display_val = f"{val:,.2f}" if isinstance(val, (int, float)) else str(val)
+            if pd.isna(val): display_val = "-"
+
+            if col in data_columns:
+                estilo_celda = get_color(val)
+            else:
+                estilo_celda = "background-color: white;" if clase == "" else ""
+
+            html += f'<td class="{clase}" style="{estilo_celda}">{display_val}</td>'
+        html += "</tr>"
+
+    if footer_totals:
+        html += "<tfoot><tr>"
+        for col in df.columns:
+            clase = ""
+            if col in header_left: clase = "sticky-left"
+            elif col in header_right: clase = "sticky-right"
+            val = footer_totals.get(col, "")
+            display_val = f"{val:,.2f}" if isinstance(val, (int, float)) else str(val)
+            html += f'<td class="{clase}">{display_val}</td>'
+        html += "</tr></tfoot>"
+
+    return html + "</table></div></div>"
+
+
+def _textos_celdas(html: str) -> list:
+    return re.findall(r"<td[^>]*>([^<]*)</td>", html)
+
+
+def bench_tabla_matriz(formas=((12, 20), (100, 100), (400, 250)), repeticiones: int = 5) -> pd.DataFrame:
+    """
+    Tiempo de armado y tamaño del HTML de la matriz (filas × columnas).
+
+    inline_kb = cuerpo con estilos en línea por celda (sin contar el <style>
+    que además repetía cada tabla); clases_kb = tabla actual completa;
+    la hoja ESTILOS_TABLAS (hoja_kb) se manda una sola vez por página.
+    """
+    resultados = []
+    for meses, sucursales in formas:
+        df = matriz_sintetica(meses, sucursales)
+        data_columns = [c for c in df.columns if c not in ("Mes", "Total")]
+        footer = {"Mes": "TOTAL", **df[data_columns + ["Total"]].sum().to_dict()}
+        args = (df, ["Mes"], data_columns, ["Total"], footer)
+
+        nuevo = construir_tabla_matriz_html(*args)
+        referencia = _cuerpo_matriz_referencia(*args)
+        assert _textos_celdas(nuevo) == _textos_celdas(referencia), "El contenido de las celdas cambió"
+
+        resultados.append({
+            "celdas": meses * (sucursales + 2),
+            "iterrows_ms": round(_medir_ms(lambda: _cuerpo_matriz_referencia(*args), repeticiones), 1),
+            "columnas_ms": round(_medir_ms(lambda: construir_tabla_matriz_html(*args), repeticiones), 1),
+            "inline_kb": round(len(referencia.encode("utf-8")) / 1024, 1),
+            "clases_kb": round(len(nuevo.encode("utf-8")) / 1024, 1),
+            "reduccion": round(len(referencia) / len(nuevo), 1),
+            "hoja_kb": round(len(ESTILOS_TABLAS.encode("utf-8")) / 1024, 1),
+        })
+
+    return pd.DataFrame(resultados)
+
+
+if __name__ == "__main__":
+    print("Filtrado por selectores (mediana por selección)")
+    print(bench_filtrado().to_string(index=False))
+    print()
+    print("Tabla matriz HTML (mediana por render)")
+    print(bench_tabla_matriz().to_string(index=False))
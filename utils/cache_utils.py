@@ -0,0 +1,530 @@
+# utils/cache_utils.py
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import inspect
+import logging
+import functools
+import threading
+import pandas as pd
+import streamlit as st
+from concurrent.futures import Future
+from utils.schema_utils import alinear_dimensiones, generacion_catalogos
+
+
+logger = logging.getLogger(__name__)
+
+
+# =========================================================
+# SNAPSHOTS EN DISCO (PARQUET POR VISTA)
+# =========================================================
+# Cada vista se guarda como <vista>.parquet + <vista>.json (metadatos).
+# El snapshot solo es válido si su versión coincide con la fecha
+# que regresa /ultima_actualizacion, es decir, hasta que corre el ETL.
+DIRECTORIO_CACHE = os.environ.get("DASHBOARD_CACHE_DIR", ".cache_vistas")
+
+
+def _rutas_snapshot(nombre_vista: str):
+    base = os.path.join(DIRECTORIO_CACHE, nombre_vista)
+    return f"{base}.parquet", f"{base}.json"
+
+
+def leer_snapshot(nombre_vista: str, version: str | None) -> pd.DataFrame | None:
+    """Regresa el DataFrame guardado si su versión sigue vigente, si no None."""
+    if not version:
+        return None
+
+    ruta_datos, ruta_meta = _rutas_snapshot(nombre_vista)
+
+    try:
+        with open(ruta_meta, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        if meta.get("version") != version:
+            return None
+
+        return pd.read_parquet(ruta_datos)
+
+    except Exception:
+        # Snapshot inexistente, corrupto o sin pyarrow: se descarga de nuevo
+        return None
+
+
+def guardar_snapshot(nombre_vista: str, version: str | None, df: pd.DataFrame):
+    """Escribe el snapshot de forma atómica (tmp + replace) junto con su versión."""
+    if not version or df is None or df.empty:
+        return
+
+    ruta_datos, ruta_meta = _rutas_snapshot(nombre_vista)
+
+    try:
+        os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+
+        df.to_parquet(f"{ruta_datos}.tmp", index=False)
+        os.replace(f"{ruta_datos}.tmp", ruta_datos)
+
+        # Los metadatos van al final: si algo falla antes, el snapshot
+        # anterior queda invalidado por versión y no se lee a medias
+        with open(f"{ruta_meta}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": version, "filas": len(df)}, f)
+        os.replace(f"{ruta_meta}.tmp", ruta_meta)
+
+    except Exception:
+        # El cache en disco es una optimización, nunca debe tumbar la página
+        for ruta in (f"{ruta_datos}.tmp", f"{ruta_meta}.tmp"):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+
+
+# =========================================================
+# HISTORIAL PARTICIONADO POR PERIODO (REFRESCO INCREMENTAL)
+# =========================================================
+# Las vistas mensuales se guardan como una carpeta con un parquet por
+# periodo (AAAAMM) + _meta.json. Los meses cerrados casi nunca cambian,
+# así que después de cada ETL solo se reescriben los periodos recientes.
+def _directorio_particiones(nombre_vista: str) -> str:
+    return os.path.join(DIRECTORIO_CACHE, nombre_vista)
+
+
+def clave_periodo(df: pd.DataFrame, columnas_periodo) -> pd.Series:
+    """(anio, mes) → entero AAAAMM, comparable y usable como nombre de archivo."""
+    col_anio, col_mes = columnas_periodo
+    return df[col_anio].astype("int64") * 100 + df[col_mes].astype("int64")
+
+
+def leer_particiones(nombre_vista: str):
+    """Regresa (metadatos, DataFrame) del historial guardado o (None, None)."""
+    directorio = _directorio_particiones(nombre_vista)
+
+    try:
+        with open(os.path.join(directorio, "_meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        partes = [
+            pd.read_parquet(os.path.join(directorio, f"{periodo}.parquet"))
+            for periodo in meta["particiones"]
+        ]
+        if not partes:
+            return None, None
+
+        return meta, pd.concat(partes, ignore_index=True)
+
+    except Exception:
+        return None, None
+
+
+def guardar_particiones(
+    nombre_vista: str,
+    df: pd.DataFrame,
+    columnas_periodo,
+    meta: dict,
+    conservar=()
+):
+    """
+    Escribe un parquet por cada periodo de df. Los periodos en `conservar`
+    (los cerrados) no se tocan; cualquier otro archivo viejo se elimina.
+    """
+    directorio = _directorio_particiones(nombre_vista)
+    ruta_meta = os.path.join(directorio, "_meta.json")
+
+    try:
+        os.makedirs(directorio, exist_ok=True)
+
+        # Primero se invalida el historial: si algo falla a medias, la
+        # siguiente carga hace una descarga completa en lugar de mezclar
+        if os.path.exists(ruta_meta):
+            os.remove(ruta_meta)
+
+        nuevos = []
+        for periodo, parte in df.groupby(clave_periodo(df, columnas_periodo), sort=True):
+            ruta = os.path.join(directorio, f"{periodo}.parquet")
+            parte.to_parquet(f"{ruta}.tmp", index=False)
+            os.replace(f"{ruta}.tmp", ruta)
+            nuevos.append(int(periodo))
+
+        particiones = sorted(set(conservar) | set(nuevos))
+
+        for archivo in os.listdir(directorio):
+            periodo, extension = os.path.splitext(archivo)
+            if extension == ".parquet" and periodo.isdigit() and int(periodo) not in particiones:
+                os.remove(os.path.join(directorio, archivo))
+
+        with open(f"{ruta_meta}.tmp", "w", encoding="utf-8") as f:
+            json.dump({**meta, "particiones": particiones}, f)
+        os.replace(f"{ruta_meta}.tmp", ruta_meta)
+
+    except Exception:
+        # Igual que los snapshots: si no se puede escribir, solo se pierde el cache
+        pass
+
+
+# =========================================================
+# SINGLE-FLIGHT (UNA SOLA CARGA POR VISTA Y VERSIÓN)
+# =========================================================
+# Cuando expira el cache y varios usuarios abren el dashboard a la vez,
+# solo el primero descarga; los demás esperan ese mismo resultado.
+_vuelos_lock = threading.Lock()
+_vuelos_en_curso = {}
+
+# ejecutadas = cargas reales, coalescidas = llamadas que esperaron a otra
+CONTADORES_SINGLE_FLIGHT = {"ejecutadas": 0, "coalescidas": 0}
+
+
+def single_flight(clave, funcion, *args, **kwargs):
+    """Ejecuta funcion(*args) una sola vez por clave entre todos los hilos del proceso."""
+    with _vuelos_lock:
+        futuro = _vuelos_en_curso.get(clave)
+        lider = futuro is None
+        if lider:
+            futuro = Future()
+            _vuelos_en_curso[clave] = futuro
+            CONTADORES_SINGLE_FLIGHT["ejecutadas"] += 1
+        else:
+            CONTADORES_SINGLE_FLIGHT["coalescidas"] += 1
+
+    if not lider:
+        logger.info("single_flight %s: esperando la carga en curso (%s)", clave, CONTADORES_SINGLE_FLIGHT)
+        return futuro.result()
+
+    try:
+        resultado = funcion(*args, **kwargs)
+        futuro.set_result(resultado)
+        return resultado
+    except BaseException as e:
+        futuro.set_exception(e)
+        raise
+    finally:
+        with _vuelos_lock:
+            _vuelos_en_curso.pop(clave, None)
+
+
+def contadores_single_flight() -> dict:
+    """Copia de CONTADORES_SINGLE_FLIGHT (para el panel de administración)."""
+    with _vuelos_lock:
+        return dict(CONTADORES_SINGLE_FLIGHT)
+
+
+# =========================================================
+# VERSIÓN DE LOS DATOS POR CONTENIDO (HUELLA)
+# =========================================================
+# La API solo publica una fecha global de ETL. Para saber qué vistas
+# cambiaron de verdad, cada carga calcula una huella de su contenido:
+# si tras un ETL la huella es la misma, el valor cacheado (y todo lo
+# derivado de él) se conserva tal cual.
+def huella_contenido(valor) -> str | None:
+    if valor is None:
+        return None
+
+    frames = valor if isinstance(valor, (tuple, list)) else (valor,)
+    digest = hashlib.md5()
+    for df in frames:
+        if not isinstance(df, pd.DataFrame):
+            digest.update(repr(df).encode("utf-8"))
+            continue
+        digest.update(",".join(map(str, df.columns)).encode("utf-8"))
+        if not df.empty:
+            digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+
+    return digest.hexdigest()[:12]
+
+
+def borrar_cache_vista(nombre_vista: str):
+    """Elimina snapshots (todas sus variantes filtradas) y particiones de una vista."""
+    if not os.path.isdir(DIRECTORIO_CACHE):
+        return
+
+    for archivo in os.listdir(DIRECTORIO_CACHE):
+        ruta = os.path.join(DIRECTORIO_CACHE, archivo)
+        if archivo == nombre_vista and os.path.isdir(ruta):
+            shutil.rmtree(ruta, ignore_errors=True)
+        elif archivo.startswith((f"{nombre_vista}.", f"{nombre_vista}__")):
+            os.remove(ruta)
+
+
+# =========================================================
+# FRAMES COMPARTIDOS (SIN PICKLE)
+# =========================================================
+# st.cache_data serializa el resultado y lo deserializa en cada acierto:
+# cada rerun pagaba una copia profunda de cada frame. Aquí el resultado
+# se guarda una sola vez y todas las sesiones reciben copias superficiales
+# del mismo objeto (costo por columna, no por fila). Con Copy-on-Write
+# (dashboard.py) una escritura en la copia copia solo esa columna y el
+# original compartido no cambia.
+def copia_superficial(valor):
+    if isinstance(valor, pd.DataFrame):
+        return valor.copy(deep=False)
+    if isinstance(valor, (tuple, list)):
+        return type(valor)(copia_superficial(v) for v in valor)
+    return valor
+
+
+def frame_compartido(ttl: int = 86400, max_entries: int = 16):
+    """
+    Reemplazo de @st.cache_data para funciones que derivan DataFrames.
+    Los DataFrames se reciben con prefijo "_" (Streamlit no los hashea) y
+    la llave es la versión del cargador (cargador.con_version()) más los
+    parámetros simples: buscar en el cache no depende del tamaño del frame.
+    La función debe recibir un parámetro "version"; si llega en None (sin
+    huella del cargador) se ejecuta sin cachear, porque la llave no
+    distinguiría un frame de otro.
+    """
+    def decorador(funcion):
+        cacheada = st.cache_resource(ttl=ttl, max_entries=max_entries, show_spinner=False)(funcion)
+        firma = inspect.signature(funcion)
+        if "version" not in firma.parameters:
+            raise TypeError(f"{funcion.__name__} necesita un parámetro 'version' para frame_compartido")
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if firma.bind(*args, **kwargs).arguments.get("version") is None:
+                return funcion(*args, **kwargs)
+            return copia_superficial(cacheada(*args, **kwargs))
+
+        envoltura.clear = cacheada.clear
+        return envoltura
+
+    return decorador
+
+
+# =========================================================
+# STALE-WHILE-REVALIDATE PARA LAS CARGAS DE CADA SECCIÓN
+# =========================================================
+# Reemplaza a @st.cache_data(ttl=...) en las funciones de carga: al
+# expirar el ttl (o al detectar un ETL nuevo) se sigue sirviendo el
+# último resultado bueno y la recarga corre en un hilo de fondo. El
+# siguiente rerun ya ve los datos nuevos. El valor es el mismo objeto
+# para todas las sesiones (sin pickle); cada llamada recibe una copia
+# superficial (ver copia_superficial).
+_swr_lock = threading.Lock()
+_swr_entradas = {}
+_swr_refrescando = set()
+
+# nombre de la función → (función original, vistas de las que depende)
+_swr_cargadores = {}
+
+# nombres de las cargas cuyo resultado puede traer DataFrames vacíos válidos
+_swr_permiten_vacios = set()
+
+# Reintentos tras una recarga fallida (excepción o resultado no válido):
+# se sigue sirviendo el valor anterior y no se vuelve a intentar hasta
+# que pase la espera, que se duplica con cada falla seguida (tope: ttl y
+# REINTENTO_MAX_SWR_S). Sin esto, durante una caída de la API cada rerun
+# de cada sesión lanzaría otra descarga completa.
+REINTENTO_SWR_S = 60
+REINTENTO_MAX_SWR_S = 15 * 60
+_swr_fallos = {}  # clave → {"fallos": n seguidas, "ultimo": time.monotonic(), "motivo": str}
+
+
+class CargaFallida(RuntimeError):
+    """Una carga de cache_swr falló y no hay un valor anterior que servir."""
+
+
+def frame_fallido() -> pd.DataFrame:
+    """DataFrame vacío que marca una descarga fallida (distinto de una vista vacía)."""
+    df = pd.DataFrame()
+    df.attrs["carga_fallida"] = True
+    return df
+
+
+def es_carga_fallida(df) -> bool:
+    return df is None or (isinstance(df, pd.DataFrame) and df.attrs.get("carga_fallida", False))
+
+
+def _resultado_valido(valor, permitir_vacios: bool = False) -> bool:
+    # None o una descarga fallida no se cachean. Un DataFrame vacío
+    # también cuenta como falla, salvo en cargas con permitir_vacios
+    # (vistas que pueden venir vacías de verdad)
+    if es_carga_fallida(valor):
+        return False
+    if isinstance(valor, pd.DataFrame):
+        return permitir_vacios or not valor.empty
+    if isinstance(valor, (tuple, list)):
+        return all(_resultado_valido(v, permitir_vacios) for v in valor)
+    return True
+
+
+def _version_actual() -> str | None:
+    # Import diferido: api_utils ya importa este módulo
+    from utils.api_utils import obtener_version_datos
+    return obtener_version_datos()
+
+
+def _alinear_dimensiones(valor):
+    if isinstance(valor, pd.DataFrame):
+        return alinear_dimensiones(valor)
+    if isinstance(valor, (tuple, list)):
+        return type(valor)(_alinear_dimensiones(v) for v in valor)
+    return valor
+
+
+def _guardar_entrada(clave, valor, version) -> dict:
+    # Dimensiones al catálogo vigente; su generación entra a la huella:
+    # mismo contenido con otro dtype es otra versión para los caches derivados
+    generacion = generacion_catalogos()
+    valor = _alinear_dimensiones(valor)
+    huella = f"{huella_contenido(valor)}.{generacion}"
+
+    with _swr_lock:
+        anterior = _swr_entradas.get(clave)
+        # Mismo contenido que antes: se conserva el objeto viejo para no
+        # invalidar los caches derivados que dependen de él
+        if anterior is not None and anterior["huella"] == huella:
+            valor = anterior["valor"]
+
+        entrada = {
+            "valor": valor,
+            "cargado": time.monotonic(),
+            "version": version,
+            "huella": huella,
+        }
+        _swr_entradas[clave] = entrada
+        _swr_fallos.pop(clave, None)
+    return entrada
+
+
+def _registrar_fallo(clave, motivo: str) -> dict:
+    """Entrada anterior que se sigue sirviendo; sin ella, CargaFallida."""
+    with _swr_lock:
+        fallos = _swr_fallos.get(clave, {"fallos": 0})["fallos"] + 1
+        _swr_fallos[clave] = {"fallos": fallos, "ultimo": time.monotonic(), "motivo": motivo}
+        entrada = _swr_entradas.get(clave)
+    logger.warning("Falló la recarga de %s (%d seguidas): %s", clave[0], fallos, motivo)
+
+    if entrada is None:
+        raise CargaFallida(motivo)
+    return entrada
+
+
+def _en_espera_reintento(clave, ttl) -> bool:
+    """True si la última recarga falló hace menos de la espera de reintento."""
+    fallo = _swr_fallos.get(clave)
+    if fallo is None:
+        return False
+    espera = min(ttl, REINTENTO_SWR_S * 2 ** (fallo["fallos"] - 1), REINTENTO_MAX_SWR_S)
+    return time.monotonic() - fallo["ultimo"] < espera
+
+
+def _recargar(clave, funcion, args, kwargs) -> dict:
+    """
+    Entrada con el valor recién cargado. Una excepción de la función o un
+    resultado no válido (None, frame_fallido(), vacío sin permitir_vacios)
+    es una falla: nunca se cachea y se sigue sirviendo la entrada anterior
+    (ver _registrar_fallo).
+    """
+    version = _version_actual()
+    try:
+        valor = single_flight(("swr", clave), funcion, *args, **kwargs)
+    except Exception as e:
+        logger.exception("Falló la carga de %s", clave[0])
+        return _registrar_fallo(clave, f"{type(e).__name__}: {e}")
+    if _resultado_valido(valor, permitir_vacios=clave[0] in _swr_permiten_vacios):
+        return _guardar_entrada(clave, valor, version)
+    return _registrar_fallo(clave, "la carga regresó datos vacíos o fallidos")
+
+
+def _refrescar_en_segundo_plano(clave, funcion, args, kwargs):
+    with _swr_lock:
+        if clave in _swr_refrescando:
+            return
+        _swr_refrescando.add(clave)
+
+    def _tarea():
+        try:
+            _recargar(clave, funcion, args, kwargs)
+        except Exception:
+            logger.exception("Falló el refresco en segundo plano de %s", clave[0])
+        finally:
+            with _swr_lock:
+                _swr_refrescando.discard(clave)
+
+    threading.Thread(target=_tarea, name=f"swr-{clave[0]}", daemon=True).start()
+
+
+def cache_swr(ttl: int = 86400, vistas=(), permitir_vacios: bool = False):
+    """
+    vistas = nombres de las vistas que usa la función; permite refrescar
+    solo las cargas afectadas cuando un admin refresca una vista.
+    permitir_vacios = un DataFrame vacío es un resultado válido y se
+    cachea. Las fallas las decide cache_swr (ver _recargar): la función
+    solo deja pasar sus excepciones. Si no hay un valor anterior que
+    servir, la llamada lanza CargaFallida.
+    """
+    def decorador(funcion):
+        nombre = f"{funcion.__module__}.{funcion.__qualname__}"
+        _swr_cargadores[nombre] = (funcion, tuple(vistas))
+        if permitir_vacios:
+            _swr_permiten_vacios.add(nombre)
+
+        def _servir(args, kwargs) -> dict:
+            clave = (nombre, args, tuple(sorted(kwargs.items())))
+            entrada = _swr_entradas.get(clave)
+
+            # Primera carga: no hay nada que servir, se espera (una sola vez).
+            # Si acaba de fallar, se respeta la espera de reintento
+            if entrada is None:
+                if _en_espera_reintento(clave, ttl):
+                    raise CargaFallida(_swr_fallos[clave]["motivo"])
+                return _recargar(clave, funcion, args, kwargs)
+
+            # Expira por ttl o porque el servicio de frescura vio un ETL nuevo;
+            # tras una recarga fallida se espera antes de intentar otra
+            version = _version_actual()
+            vencida = time.monotonic() - entrada["cargado"] > ttl
+            etl_nuevo = version is not None and entrada["version"] != version
+            if (vencida or etl_nuevo) and not _en_espera_reintento(clave, ttl):
+                _refrescar_en_segundo_plano(clave, funcion, args, kwargs)
+
+            return entrada
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            return copia_superficial(_servir(args, kwargs)["valor"])
+
+        def con_version(*args, **kwargs):
+            """
+            (valor, huella) de la misma entrada: la huella sirve de llave a
+            caches derivados y corresponde siempre al valor regresado, aunque
+            un refresco en segundo plano la reemplace entre llamadas.
+            """
+            entrada = _servir(args, kwargs)
+            return copia_superficial(entrada["valor"]), entrada["huella"]
+
+        def esta_refrescando() -> bool:
+            return any(clave[0] == nombre for clave in list(_swr_refrescando))
+
+        envoltura.con_version = con_version
+        envoltura.esta_refrescando = esta_refrescando
+        return envoltura
+
+    return decorador
+
+
+def refrescar_vista(nombre_vista: str) -> int:
+    """
+    Refresca una sola vista: borra su cache en disco y recarga únicamente
+    las funciones que dependen de ella. Regresa cuántas cargas se rehicieron.
+    El resto de las vistas y sesiones no se tocan.
+    """
+    borrar_cache_vista(nombre_vista)
+
+    afectadas = [
+        (clave, _swr_cargadores[clave[0]][0])
+        for clave in list(_swr_entradas)
+        if nombre_vista in _swr_cargadores.get(clave[0], (None, ()))[1]
+    ]
+
+    for clave, funcion in afectadas:
+        _, args, kwargs = clave
+        _recargar(clave, funcion, args, dict(kwargs))
+
+    return len(afectadas)
+
+
+def mostrar_indicador_refresco(*cargadores):
+    """Aviso discreto mientras alguna carga de la sección se actualiza en segundo plano."""
+    if any(cargador.esta_refrescando() for cargador in cargadores):
+        st.caption("🔄 Actualizando datos en segundo plano… se mostrarán en la próxima interacción.")
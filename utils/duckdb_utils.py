@@ -0,0 +1,140 @@
+# utils/duckdb_utils.py
+
+import os
+import time
+import logging
+import threading
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:  # El motor es opcional: sin duckdb todo corre en pandas
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+
+# =========================================================
+# MOTOR DE CONSULTAS PARA LAS AGREGACIONES DE LAS SECCIONES
+# =========================================================
+# DASHBOARD_MOTOR elige cómo corren las agregaciones registradas con
+# consulta():
+#   "pandas"   → la ruta original (default)
+#   "duckdb"   → SQL columnar y multihilo sobre los mismos frames en
+#                memoria (DuckDB los lee en sitio, sin copiarlos)
+#   "comparar" → corre ambas, registra tiempos y diferencias y regresa
+#                el resultado de pandas
+MOTORES = ("pandas", "duckdb", "comparar")
+
+# nombre de la consulta → última comparación (tiempos y si coincidió)
+COMPARACIONES = {}
+
+_conexion = None
+_conexion_lock = threading.Lock()
+_local = threading.local()
+
+
+def motor_consultas() -> str:
+    motor = os.environ.get("DASHBOARD_MOTOR", "pandas").strip().lower()
+    if motor not in MOTORES:
+        return "pandas"
+    if motor != "pandas" and duckdb is None:
+        logger.warning("DASHBOARD_MOTOR=%s pero duckdb no está instalado; se usa pandas", motor)
+        return "pandas"
+    return motor
+
+
+def _cursor():
+    """Un cursor por hilo sobre una sola base en memoria (los hilos de Streamlit no comparten cursor)."""
+    global _conexion
+
+    cursor = getattr(_local, "cursor", None)
+    if cursor is not None:
+        return cursor
+
+    with _conexion_lock:
+        if _conexion is None:
+            _conexion = duckdb.connect(database=":memory:")
+            _conexion.execute(f"SET threads TO {os.cpu_count() or 1}")
+
+    _local.cursor = _conexion.cursor()
+    return _local.cursor
+
+
+def ejecutar_sql(sql: str, frames: dict, parametros=None) -> pd.DataFrame:
+    """Registra `frames` como tablas (nombre → DataFrame), corre `sql` y regresa un DataFrame."""
+    cursor = _cursor()
+    for nombre, df in frames.items():
+        cursor.register(nombre, df)
+    try:
+        return cursor.execute(sql, parametros or []).df()
+    finally:
+        for nombre in frames:
+            cursor.unregister(nombre)
+
+
+def _comparable(df: pd.DataFrame, ignorar_orden: bool) -> pd.DataFrame:
+    # Categóricas (pandas) y ENUM/VARCHAR (duckdb) se comparan como texto
+    df = df.reset_index(drop=True).copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+    if ignorar_orden:
+        df = df.sort_values(list(df.columns), kind="mergesort").reset_index(drop=True)
+    return df
+
+
+def consulta(nombre: str, ruta_pandas, sql: str, frames: dict, parametros=None, ignorar_orden=False):
+    """
+    Corre la agregación `nombre` con el motor activo.
+
+    ruta_pandas  = función sin argumentos con la implementación en pandas.
+    sql + frames = la misma agregación en DuckDB; debe regresar las mismas
+                   columnas, en el mismo orden, con índice 0..n.
+    ignorar_orden = True cuando el orden de filas no importa al consumidor.
+    """
+    motor = motor_consultas()
+    if motor == "pandas":
+        return ruta_pandas()
+
+    if motor == "duckdb":
+        try:
+            return ejecutar_sql(sql, frames, parametros)
+        except Exception:
+            logger.exception("Falló la consulta DuckDB %s; se usa pandas", nombre)
+            return ruta_pandas()
+
+    # --- comparar ---
+    inicio = time.perf_counter()
+    esperado = ruta_pandas()
+    pandas_ms = (time.perf_counter() - inicio) * 1000
+
+    try:
+        inicio = time.perf_counter()
+        obtenido = ejecutar_sql(sql, frames, parametros)
+        duckdb_ms = (time.perf_counter() - inicio) * 1000
+    except Exception:
+        logger.exception("Falló la consulta DuckDB %s", nombre)
+        return esperado
+
+    diferencia = None
+    try:
+        pd.testing.assert_frame_equal(
+            _comparable(esperado, ignorar_orden),
+            _comparable(obtenido, ignorar_orden),
+            check_dtype=False,
+            check_exact=False,
+            rtol=1e-9,
+        )
+    except AssertionError as e:
+        diferencia = str(e)
+        logger.warning("La consulta %s difiere entre pandas y DuckDB: %s", nombre, diferencia)
+
+    COMPARACIONES[nombre] = {
+        "pandas_ms": round(pandas_ms, 2),
+        "duckdb_ms": round(duckdb_ms, 2),
+        "filas": len(esperado),
+        "coincide": diferencia is None,
+    }
+    logger.info("consulta %s: %s", nombre, COMPARACIONES[nombre])
+    return esperado
@@ -0,0 +1,108 @@
+# utils/indice_utils.py
+
+import streamlit as st
+import pandas as pd
+
+
+# =========================================================
+# FRAMES INDEXADOS POR LLAVES DE FILTRO
+# =========================================================
+# Cada vista se ordena una sola vez (por versión de datos) sobre las
+# columnas que usan los selectores. Una selección se resuelve con .loc
+# sobre el MultiIndex ordenado (búsqueda binaria por nivel) en lugar de
+# armar una máscara booleana por filtro sobre todo el frame.
+VALORES_TODOS = ("TODAS", "TODOS")
+
+
+def indexar_por(df: pd.DataFrame, llaves) -> pd.DataFrame:
+    """Ordena e indexa df por `llaves`; las llaves salen de las columnas."""
+    return df.set_index(list(llaves)).sort_index()
+
+
+def frame_indexado(nombre, df, llaves, version):
+    """
+    indexar_por compartido entre sesiones. La llave es nombre + llaves +
+    version (huella del cargador); el frame no se hashea. Sin versión la
+    llave no distingue un frame de otro: se indexa sin cachear.
+    """
+    if version is None:
+        return indexar_por(df, llaves)
+    return _frame_indexado_cacheado(nombre, df, llaves, version)
+
+
+@st.cache_resource(max_entries=8)
+def _frame_indexado_cacheado(nombre, _df, llaves, version):
+    return indexar_por(_df, llaves)
+
+
+def seleccionar(df_indexado: pd.DataFrame, **valores) -> pd.DataFrame:
+    """
+    valores = nivel → valor. "TODAS"/"TODOS" o un nivel omitido dejan
+    pasar el nivel completo. Regresa un DataFrame plano (llaves como columnas).
+    """
+    llave = tuple(
+        slice(None) if valores.get(nivel, "TODAS") in VALORES_TODOS else [valores[nivel]]
+        for nivel in df_indexado.index.names
+    )
+    try:
+        return df_indexado.loc[llave, :].reset_index()
+    except KeyError:
+        # Valor que no existe en el índice: selección vacía
+        return df_indexado.iloc[0:0].reset_index()
+
+
+# =========================================================
+# JERARQUÍA DE OPCIONES PARA SELECTORES DEPENDIENTES
+# =========================================================
+def _construir_nivel(combos, niveles, totales, orden):
+    nivel, resto = niveles[0], niveles[1:]
+    columna, descendente = orden.get(nivel, (nivel, False))
+    valores = (
+        combos.sort_values(columna, ascending=not descendente)[nivel]
+        .drop_duplicates()
+        .tolist()
+    )
+
+    # El total ("TODAS"/"TODOS") va primero, como en los selectbox
+    if not resto:
+        return ([totales[nivel]] if nivel in totales else []) + valores
+
+    nodo = {}
+    if nivel in totales:
+        nodo[totales[nivel]] = _construir_nivel(combos, resto, totales, orden)
+    for valor in valores:
+        nodo[valor] = _construir_nivel(combos[combos[nivel] == valor], resto, totales, orden)
+    return nodo
+
+
+def jerarquia_opciones(nombre, df, niveles, version, totales=None, orden=None):
+    """
+    Árbol {valor_nivel_1: {valor_nivel_2: ... [opciones del último nivel]}}
+    con solo las combinaciones que existen en el frame; se arma una vez
+    por versión y los selectores dependientes leen de diccionarios.
+
+    totales = nivel → etiqueta de total ("TODAS"/"TODOS"); su nodo tiene
+    las opciones de todos los valores del nivel.
+    orden   = nivel → (columna, descendente) para ordenar sus opciones
+    (p. ej. mes_nombre por mes). Por defecto, el propio nivel ascendente.
+    Sin versión se arma sin cachear (igual que frame_indexado).
+    """
+    if version is None:
+        return _armar_jerarquia(df, niveles, totales, orden)
+    return _jerarquia_cacheada(nombre, df, niveles, version, totales, orden)
+
+
+@st.cache_resource(max_entries=8)
+def _jerarquia_cacheada(nombre, _df, niveles, version, totales, orden):
+    return _armar_jerarquia(_df, niveles, totales, orden)
+
+
+def _armar_jerarquia(df, niveles, totales, orden):
+    totales = totales or {}
+    orden = orden or {}
+    niveles = list(niveles)
+
+    columnas = list(dict.fromkeys(niveles + [col for col, _ in orden.values()]))
+    combos = df[columnas].dropna(subset=niveles).drop_duplicates()
+
+    return _construir_nivel(combos, niveles, totales, orden)
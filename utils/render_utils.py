@@ -0,0 +1,119 @@
+# utils/render_utils.py
+
+import os
+import json
+import threading
+from collections import OrderedDict
+
+import altair as alt
+import streamlit as st
+
+
+# =========================================================
+# CACHE DE ARTEFACTOS RENDERIZADOS
+# =========================================================
+# HTML de tablas, specs Vega-Lite (Altair) y figuras Plotly como JSON.
+# Si ni los datos ni los parámetros cambiaron, un rerun reutiliza el
+# artefacto ya armado en lugar de reconstruirlo. La llave es
+# (nombre, versión de datos, parámetros): versión = huella del cargador
+# (cargador.con_version()), así que un ETL con contenido nuevo cambia la
+# llave sola. Se comparte entre sesiones y se desaloja por LRU cuando
+# el total pasa de PRESUPUESTO_ARTEFACTOS_BYTES.
+PRESUPUESTO_ARTEFACTOS_BYTES = int(os.environ.get("DASHBOARD_CACHE_RENDER_MB", "64")) * 1024 * 1024
+
+_artefactos_lock = threading.Lock()
+_artefactos = OrderedDict()  # llave → (artefacto, bytes)
+_artefactos_bytes = 0
+
+CONTADORES_ARTEFACTOS = {"aciertos": 0, "fallos": 0, "desalojos": 0}
+
+
+def _tamano_artefacto(artefacto) -> int:
+    if isinstance(artefacto, str):
+        return len(artefacto.encode("utf-8"))
+    if isinstance(artefacto, bytes):
+        return len(artefacto)
+    if isinstance(artefacto, (tuple, list)):
+        return sum(_tamano_artefacto(parte) for parte in artefacto)
+    if isinstance(artefacto, (int, float)) or artefacto is None:
+        return 8
+    return len(json.dumps(artefacto, default=str).encode("utf-8"))
+
+
+def artefacto_renderizado(nombre: str, version, parametros, construir):
+    """
+    construir() cacheado por (nombre, version, parametros). parametros
+    debe ser hashable (tupla) y, junto con version, determinar por
+    completo el resultado. Sin versión (datos aún no cargados) no se cachea.
+    Los artefactos se comparten entre sesiones: deben ser inmutables
+    (str / tuplas) o tratarse como de solo lectura.
+    """
+    global _artefactos_bytes
+
+    if version is None:
+        return construir()
+
+    llave = (nombre, version, parametros)
+    with _artefactos_lock:
+        entrada = _artefactos.get(llave)
+        if entrada is not None:
+            _artefactos.move_to_end(llave)
+            CONTADORES_ARTEFACTOS["aciertos"] += 1
+            return entrada[0]
+        CONTADORES_ARTEFACTOS["fallos"] += 1
+
+    artefacto = construir()
+    tamano = _tamano_artefacto(artefacto)
+
+    with _artefactos_lock:
+        # Un artefacto más grande que todo el presupuesto no se guarda
+        if tamano > PRESUPUESTO_ARTEFACTOS_BYTES or llave in _artefactos:
+            return artefacto
+
+        _artefactos[llave] = (artefacto, tamano)
+        _artefactos_bytes += tamano
+        while _artefactos_bytes > PRESUPUESTO_ARTEFACTOS_BYTES:
+            _, (_, liberados) = _artefactos.popitem(last=False)
+            _artefactos_bytes -= liberados
+            CONTADORES_ARTEFACTOS["desalojos"] += 1
+
+    return artefacto
+
+
+# =========================================================
+# GRÁFICAS CACHEADAS
+# =========================================================
+def _spec_altair(chart) -> str:
+    # Sin max_rows: el spec se serializa una vez y queda en el cache, así
+    # que el límite de filas de Altair (MaxRowsError) no aplica aquí
+    with alt.data_transformers.enable(max_rows=None):
+        return chart.to_json()
+
+
+def mostrar_altair_cacheado(nombre: str, version, parametros, construir_chart):
+    """
+    st.vega_lite_chart con el spec Vega-Lite cacheado: en un acierto no se
+    arma el chart de Altair ni se corre to_dict() con su validación de
+    esquema, solo se manda el JSON guardado (con el tema de Streamlit,
+    igual que st.altair_chart).
+    """
+    spec = artefacto_renderizado(nombre, version, parametros, lambda: _spec_altair(construir_chart()))
+    st.vega_lite_chart(json.loads(spec), use_container_width=True)
+
+
+def mostrar_plotly_cacheado(nombre: str, version, parametros, construir_figura, **kwargs) -> bool:
+    """
+    st.plotly_chart con la figura guardada como JSON (fig.to_json()): en
+    un acierto no se agrega ni se arma la figura con plotly express.
+    construir_figura() puede regresar None (sin datos); entonces no se
+    dibuja nada y regresa False.
+    """
+    def _construir():
+        figura = construir_figura()
+        return None if figura is None else figura.to_json()
+
+    figura = artefacto_renderizado(nombre, version, parametros, _construir)
+    if figura is None:
+        return False
+    st.plotly_chart(json.loads(figura), **kwargs)
+    return True
@@ -0,0 +1,259 @@
+# utils/schema_utils.py
+
+import json
+import hashlib
+import threading
+import pandas as pd
+
+
+# =========================================================
+# TIPOS DISPONIBLES
+# =========================================================
+#   "monto"    → float64, nulos = 0 (ventas, costos, metas que se suman)
+#   "float64"  → float64, conserva NaN (márgenes, % o metas opcionales)
+#   "int32"    → int32, nulos = 0 (año / mes / contadores)
+#   "Int32"    → entero nullable (ids que pueden venir vacíos)
+#   "category" → categórico (textos repetidos de baja cardinalidad)
+def _a_numero(serie: pd.Series) -> pd.Series:
+    return pd.to_numeric(serie, errors="coerce")
+
+
+_CONVERSIONES = {
+    "monto": lambda s: _a_numero(s).fillna(0).astype("float64"),
+    "float64": lambda s: _a_numero(s).astype("float64"),
+    "int32": lambda s: _a_numero(s).fillna(0).astype("int32"),
+    "Int32": lambda s: _a_numero(s).round().astype("Int32"),
+    "category": lambda s: s.astype("category"),
+}
+
+
+# =========================================================
+# ESQUEMA POR VISTA
+# =========================================================
+# Único lugar donde se declaran los tipos de cada vista. Las columnas
+# que no aparecen aquí se quedan con el tipo que infiere la ingesta.
+ESQUEMAS_VISTAS = {
+    "vw_facturacion_sucursal_mes_jd": {
+        "anio_fiscal_jd": "int32",
+        "orden_mes_fiscal": "int32",
+        "sucursal_id": "Int32",
+        "venta_real": "monto",
+        "costo_real": "monto",
+        "utilidad_real": "monto",
+        "margen_porcentaje": "float64",
+    },
+    "vw_dashboard_meta_sucursal": {
+        "anio_fiscal_jd": "int32",
+        "orden_mes_fiscal": "int32",
+        "sucursal_id": "Int32",
+        "venta_real": "monto",
+        "meta": "monto",
+        "porcentaje_cumplimiento": "float64",
+    },
+    "vw_dashboard_comercial_refacciones_final": {
+        "venta_mostrador": "monto",
+        "costo_mostrador": "monto",
+        "venta_servicio_subref": "monto",
+        "venta_total_combinada": "monto",
+        "meta_mes": "monto",
+        "pct_alcance_meta": "monto",
+        "margen_pct_mostrador": "monto",
+    },
+    "vw_dashboard_meta_vendedor_jd": {
+        "anio": "int32",
+        "mes": "int32",
+        "meta_vendedor": "float64",  # NaN = vendedor sin meta
+        "venta_real": "monto",
+        "costo_real": "monto",
+        "utilidad_real": "monto",
+        "margen_real": "float64",
+        "porcentaje_cumplimiento": "float64",
+    },
+    "vw_dashboard_ubicacion_clientes_mes": {
+        "anio": "int32",
+        "mes": "int32",
+        "mes_nombre": "category",
+        "cliente_latitud": "float64",
+        "cliente_longitud": "float64",
+        "sucursal_latitud": "float64",
+        "sucursal_longitud": "float64",
+        "clientes_unicos": "int32",
+        "facturas": "int32",
+        "venta_total": "monto",
+    },
+    "vw_cancelaciones_clientes_detalle": {
+        "anio": "int32",
+        "mes": "int32",
+        "facturas_canceladas": "int32",
+    },
+    "vw_division_vs_meta_jd": {
+        "anio_jd": "int32",
+        "mes_jd": "int32",
+        "division_nombre": "category",
+        "periodo_label": "category",
+        "compra_real": "monto",
+        "meta_monto": "monto",
+        "porcentaje_avance": "float64",
+        "diferencia_vs_meta": "float64",
+    },
+    "vw_dashboard_metas_sucursal_por_linea": {
+        "anio": "int32",
+        "mes": "int32",
+        "mes_nombre": "category",
+        "venta_real": "monto",
+        "costo_real": "monto",
+        "utilidad_real": "monto",
+        "margen_real": "float64",
+        "meta_sucursal_linea": "monto",
+    },
+    "vw_dashboard_metas_por_linea": {
+        "anio": "int32",
+        "mes": "int32",
+        "mes_nombre": "category",
+        "venta_real": "monto",
+        "costo_real": "monto",
+        "utilidad_real": "monto",
+        "margen_real": "float64",
+        "meta_vendedor_linea": "float64",
+        "porcentaje_cumplimiento": "float64",
+    },
+    "vw_dashboard_venta_linea_proveedor": {
+        "anio": "int32",
+        "mes": "int32",
+        "mes_nombre": "category",
+        "venta_real": "monto",
+        "costo_real": "monto",
+        "utilidad_real": "monto",
+        "margen_real": "float64",
+    },
+}
+
+
+# =========================================================
+# DIMENSIONES COMPARTIDAS
+# =========================================================
+# Columnas de texto que se repiten entre vistas. Se guardan como
+# categóricas con un mismo catálogo por dimensión (ordenado
+# alfabéticamente), así los filtros y groupby comparan códigos enteros.
+#
+# El catálogo es la unión de los valores vigentes de cada origen (vista
+# o variante filtrada): cuando un origen se recarga, sus valores viejos
+# se reemplazan, así que el catálogo solo contiene datos actuales. Si
+# los valores de un origen no cambian, el catálogo (y el dtype) tampoco.
+#
+# Un merge/concat conserva la categórica solo entre frames con el mismo
+# catálogo. Cuando un catálogo cambia sube generacion_catalogos():
+# cache_swr realinea cada carga al catálogo vigente (alinear_dimensiones)
+# y mete la generación en su huella, así que los caches derivados
+# (llaveados por esa huella) se reconstruyen con el dtype nuevo. Frames
+# de cargas distintas pueden venir de generaciones distintas: para
+# combinarlos, pasar ambos por alinear_dimensiones.
+DIMENSIONES = ("sucursal", "vendedor", "linea", "Cliente", "Proveedor")
+
+# Vistas con textos crudos que su sección limpia después (strip/upper,
+# nulos → "NONE"): no se registran en el catálogo compartido
+VISTAS_SIN_CATALOGO = {"vw_cancelaciones_clientes_detalle"}
+
+_catalogos_lock = threading.Lock()
+_VALORES_DIMENSION: dict[str, dict[str, pd.Index]] = {}  # dimensión → origen → valores
+_CATALOGOS_DIMENSION: dict[str, pd.Index] = {}
+_generacion_catalogos = 0
+
+
+def generacion_catalogos() -> int:
+    """Sube cada vez que cambia algún catálogo (y con él el dtype de su dimensión)."""
+    return _generacion_catalogos
+
+
+def catalogo_dimension(dimension: str, valores, origen: str) -> pd.Index:
+    """Registra los valores actuales de `origen` y regresa el catálogo completo de la dimensión."""
+    global _generacion_catalogos
+
+    actuales = pd.Index(valores).dropna().unique().sort_values()
+    with _catalogos_lock:
+        por_origen = _VALORES_DIMENSION.setdefault(dimension, {})
+        catalogo = _CATALOGOS_DIMENSION.get(dimension)
+
+        anteriores = por_origen.get(origen)
+        if catalogo is not None and anteriores is not None and anteriores.equals(actuales):
+            return catalogo
+
+        por_origen[origen] = actuales
+        nuevo = pd.Index([]).append(list(por_origen.values())).unique().sort_values()
+        if catalogo is None or not nuevo.equals(catalogo):
+            _CATALOGOS_DIMENSION[dimension] = nuevo
+            _generacion_catalogos += 1
+            return nuevo
+        return catalogo
+
+
+def codificar_dimension(serie: pd.Series, origen: str) -> pd.Series:
+    """Convierte la serie a categórica con el catálogo compartido de su dimensión."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        valores = serie.cat.remove_unused_categories().cat.categories
+    else:
+        valores = serie.unique()
+    catalogo = catalogo_dimension(serie.name, valores, origen)
+    return serie.astype(pd.CategoricalDtype(catalogo))
+
+
+def codificar_dimensiones(df: pd.DataFrame, origen: str) -> pd.DataFrame:
+    """
+    Aplica codificar_dimension a todas las dimensiones presentes.
+    origen = vista (o clave de la variante filtrada) de la que viene df.
+    """
+    presentes = [col for col in DIMENSIONES if col in df.columns]
+    if not presentes or df.empty:
+        return df
+    return df.assign(**{col: codificar_dimension(df[col], origen) for col in presentes})
+
+
+def alinear_dimensiones(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Recodifica las dimensiones categóricas de df al catálogo vigente (solo
+    cambian los códigos, no los valores). Las que traen valores fuera del
+    catálogo (VISTAS_SIN_CATALOGO) se dejan igual.
+    """
+    with _catalogos_lock:
+        catalogos = dict(_CATALOGOS_DIMENSION)
+
+    alineadas = {}
+    for col in DIMENSIONES:
+        catalogo = catalogos.get(col)
+        if catalogo is None or col not in df.columns or not isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        categorias = df[col].cat.categories
+        if categorias.equals(catalogo) or not categorias.isin(catalogo).all():
+            continue
+        alineadas[col] = df[col].cat.set_categories(catalogo)
+
+    return df.assign(**alineadas) if alineadas else df
+
+
+def codificar_dimensiones_vista(df: pd.DataFrame, nombre_vista: str, origen: str = None) -> pd.DataFrame:
+    """codificar_dimensiones para un frame recién cargado de nombre_vista (respeta VISTAS_SIN_CATALOGO)."""
+    if nombre_vista in VISTAS_SIN_CATALOGO:
+        return df
+    return codificar_dimensiones(df, origen or nombre_vista)
+
+
+def aplicar_esquema(df: pd.DataFrame, nombre_vista: str, origen: str = None) -> pd.DataFrame:
+    """Convierte en una sola pasada todas las columnas declaradas de la vista."""
+    esquema = ESQUEMAS_VISTAS.get(nombre_vista)
+    if df.empty:
+        return df
+    if not esquema:
+        return codificar_dimensiones_vista(df, nombre_vista, origen)
+
+    convertidas = {
+        col: _CONVERSIONES[tipo](df[col])
+        for col, tipo in esquema.items()
+        if col in df.columns
+    }
+    return codificar_dimensiones_vista(df.assign(**convertidas), nombre_vista, origen)
+
+
+def firma_esquema(nombre_vista: str) -> str:
+    """Huella corta del esquema; si cambia, los snapshots viejos dejan de valer."""
+    esquema = json.dumps(ESQUEMAS_VISTAS.get(nombre_vista, {}), sort_keys=True)
+    return hashlib.md5(esquema.encode("utf-8")).hexdigest()[:8]
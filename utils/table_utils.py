@@ -1,9 +1,12 @@
 # utils/table_utils.py
+import math
 import pandas as pd
 import numpy as np
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
 import json
+from utils.render_utils import artefacto_renderizado
 from st_aggrid import (
     AgGrid,
     GridOptionsBuilder,
@@ -61,6 +64,72 @@ function(params) {
 
 
 
+# --------------------------------------------------
+# MODO PAGINADO (TABLAS GRANDES EN AGGRID)
+# --------------------------------------------------
+# AgGrid recibe el DataFrame completo serializado como JSON en cada
+# rerun. Con paginar=True la tabla se queda en el servidor: búsqueda y
+# orden se hacen en pandas y al grid solo viaja la página visible
+# (FILAS_POR_PAGINA filas). El grid conserva su key entre reruns, así
+# que cambiar de página solo recarga sus datos (reload_data). Es opt-in:
+# quien llama decide (p. ej. a partir de FILAS_PAGINAR filas) y da la key.
+FILAS_PAGINAR = 2000
+FILAS_POR_PAGINA = 200
+SIN_ORDEN = "(sin orden)"
+
+
+def _llave_grid(key: str, paginar: bool) -> str | None:
+    """
+    Key del grid y prefijo de sus controles de página. El modo paginado
+    guarda búsqueda/orden/página en session_state: dos tablas con la misma
+    llave compartirían ese estado, así que exige una key explícita.
+    """
+    if paginar and not key:
+        raise ValueError("El modo paginado necesita key= única por tabla")
+    return key
+
+
+def _pagina_servidor(df: pd.DataFrame, llave: str, filas_por_pagina: int = FILAS_POR_PAGINA) -> pd.DataFrame:
+    """Controles de búsqueda, orden y página; regresa solo las filas de la página."""
+    col_buscar, col_orden, col_desc, col_pagina = st.columns([3, 2, 1, 1])
+
+    texto = col_buscar.text_input(
+        "Buscar", key=f"{llave}_buscar", placeholder="Filtrar filas por texto…"
+    )
+    orden = col_orden.selectbox(
+        "Ordenar por", [SIN_ORDEN] + list(df.columns), key=f"{llave}_orden"
+    )
+    descendente = col_desc.checkbox("Descendente", key=f"{llave}_desc")
+
+    # --- FILTRO (columnas de texto) ---
+    vista = df
+    if texto:
+        mascara = np.zeros(len(df), dtype=bool)
+        for col in df.columns:
+            if not pd.api.types.is_numeric_dtype(df[col].dtype):
+                mascara |= df[col].astype(str).str.contains(texto, case=False, regex=False).to_numpy()
+        vista = vista[mascara]
+
+    # --- ORDEN ---
+    if orden != SIN_ORDEN:
+        vista = vista.sort_values(orden, ascending=not descendente, kind="mergesort")
+
+    # --- PÁGINA ---
+    paginas = max(1, math.ceil(len(vista) / filas_por_pagina))
+    llave_pagina = f"{llave}_pagina"
+    # Si el filtro dejó menos páginas, se ajusta antes de crear el widget
+    if st.session_state.get(llave_pagina, 1) > paginas:
+        st.session_state[llave_pagina] = paginas
+    pagina = col_pagina.number_input(
+        f"Página (de {paginas})", min_value=1, max_value=paginas, step=1, key=llave_pagina
+    )
+
+    inicio = (int(pagina) - 1) * filas_por_pagina
+    fin = min(inicio + filas_por_pagina, len(vista))
+    st.caption(f"Filas {inicio + 1 if len(vista) else 0:,}–{fin:,} de {len(vista):,}")
+    return vista.iloc[inicio:fin]
+
+
 # --------------------------------------------------
 # TABLA BASE REUTILIZABLE
 # --------------------------------------------------
@@ -71,8 +140,14 @@ def mostrar_tabla_normal(
     columnas_sin_degradado=None,
     columna_total=None,
     height=600,
-    resaltar_primera_columna: bool = False
+    resaltar_primera_columna: bool = False,
+    paginar: bool = False,
+    key: str = None
 ):
+    """
+    paginar=True activa el modo paginado (orden y búsqueda en el
+    servidor, al grid solo va la página); en ese modo key es obligatoria.
+    """
     if df.empty:
         return
 
@@ -80,24 +155,27 @@ def mostrar_tabla_normal(
     columnas_numericas = columnas_numericas or []
     columnas_sin_degradado = columnas_sin_degradado or []
 
+    llave = _llave_grid(key, paginar)
+    datos = _pagina_servidor(df, llave) if paginar else df
+
     # ---------------------------------
     # ALTURA DINÁMICA
     # ---------------------------------
     row_height = 35
     header_height = 40
     calculated_height = min(
-        header_height + row_height * (len(df) + 1),
+        header_height + row_height * (len(datos) + 1),
         height
     )
 
-    gb = GridOptionsBuilder.from_dataframe(df)
+    gb = GridOptionsBuilder.from_dataframe(datos)
 
     # ---------------------------------
     # CONFIGURACIÓN GENERAL
     # ---------------------------------
     gb.configure_default_column(
         resizable=True,
-        sortable=True,
+        sortable=not paginar,  # paginado: el orden lo hace el servidor
         filter=False,
         minWidth=110,
         wrapText=False
@@ -133,6 +211,7 @@ def mostrar_tabla_normal(
     # ---------------------------------
     # 🎨 CALCULAR MIN / MAX POR COLUMNA
     # ---------------------------------
+    # Sobre el df completo: el color no cambia de una página a otra
     min_max = {}
     for col in columnas_numericas:
         if col not in columnas_sin_degradado and col in df.columns:
@@ -250,14 +329,16 @@ def mostrar_tabla_normal(
     # ---------------------------------
 
     AgGrid(
-        df,
+        datos,
         gridOptions=grid_options,
         theme=AgGridTheme.ALPINE,
         height=calculated_height,
         use_container_width=True,
         fit_columns_on_grid_load=False,
         allow_unsafe_jscode=True,
-        #key=f"aggrid_{hash(pd.util.hash_pandas_object(df).sum())}"
+        # Con key fija el grid no se vuelve a montar: reload_data le pasa las filas nuevas
+        key=llave,
+        reload_data=bool(llave)
     )
 
 
@@ -271,13 +352,22 @@ def mostrar_tabla_matriz(
     data_columns: list,
     header_right: list = None,
     footer_totals: dict = None,
-    max_height: int = 600
+    max_height: int = 600,
+    paginar: bool = False,
+    key: str = None
 ):
+    """
+    paginar=True activa el modo paginado (key obligatoria); el degradado
+    y footer_totals siguen calculados sobre el df completo.
+    """
     if df.empty:
         return
 
     header_right = header_right or []
 
+    llave = _llave_grid(key, paginar)
+    datos = _pagina_servidor(df, llave) if paginar else df
+
     # ----------------------------
     # ALTURAS BASE
     # ----------------------------
@@ -291,14 +381,14 @@ def mostrar_tabla_matriz(
 
     dynamic_height = (
         header_height +
-        (len(df) * row_height) +
+        (len(datos) * row_height) +
         footer_height +
         aggrid_buffer
     )
 
     final_height = min(dynamic_height, max_height)
 
-    gb = GridOptionsBuilder.from_dataframe(df)
+    gb = GridOptionsBuilder.from_dataframe(datos)
 
     # ----------------------------
     # CONFIG GENERAL
@@ -435,13 +525,16 @@ def mostrar_tabla_matriz(
     grid_options["alwaysShowHorizontalScroll"] = False
 
     AgGrid(
-        df,
+        datos,
         gridOptions=grid_options,
         theme=AgGridTheme.ALPINE,
         height=final_height,
         use_container_width=True,
         fit_columns_on_grid_load=False,
-        allow_unsafe_jscode=True
+        allow_unsafe_jscode=True,
+        # Con key fija el grid no se vuelve a montar: reload_data le pasa las filas nuevas
+        key=llave,
+        reload_data=bool(llave)
     )
 
 
@@ -582,332 +675,639 @@ def mostrar_tabla_normal_cloud(
 
 
 
-def mostrar_tabla_matriz_html(
+# --------------------------------------------------
+# MOTOR DE TABLAS HTML (POR COLUMNA)
+# --------------------------------------------------
+# Las tablas HTML describen cada columna como (clases, texto), calculados
+# de una vez para la columna completa: un str si es igual en todas las
+# filas o un arreglo con un valor por fila. _filas_html arma todas las
+# filas con la plantilla <td class="…">…</td> en una sola pasada.
+#
+# Los colores no van en línea: el degradado se cuantiza en
+# NIVELES_DEGRADADO + 1 clases (deg-0 … deg-N) y toda la hoja de estilos
+# (ESTILOS_TABLAS) se inyecta una sola vez por página con
+# inyectar_estilos_tablas(). Cada tabla solo lleva su max-height en línea.
+NIVELES_DEGRADADO = 20
+
+
+def _css_degradado() -> str:
+    # Mismo degradado azul (claro → #1565C0) que antes calculaba cada celda
+    reglas = []
+    for nivel in range(NIVELES_DEGRADADO + 1):
+        ratio = nivel / NIVELES_DEGRADADO
+        r = int(227 + ratio * (21 - 227))
+        g = int(242 + ratio * (101 - 242))
+        b = int(253 + ratio * (192 - 253))
+        texto = "white" if ratio > 0.6 else "#0B083D"
+        reglas.append(
+            f".tabla-html td.deg-{nivel} {{ background-color: rgb({r},{g},{b}); color: {texto}; }}"
+        )
+    return "\n".join(reglas)
+
+
+ESTILOS_TABLAS = """
+<style>
+    /* ===== Comunes ===== */
+    .tabla-html .table-container { height: auto; overflow: auto; position: relative; background-color: transparent; }
+    .tabla-html .table-container::-webkit-scrollbar { width: 7px; height: 7px; }
+    .tabla-html .table-container::-webkit-scrollbar-track { background: transparent; }
+    .tabla-html .table-container::-webkit-scrollbar-thumb { background: #d1d5db; border-radius: 10px; }
+    .tabla-html .table-container::-webkit-scrollbar-thumb:hover { background: #9ca3af; }
+    .tabla-html table { border-collapse: separate; border-spacing: 0; width: 100%; font-size: 0.85rem; background-color: white; }
+
+    /* ===== Matriz (mostrar_tabla_matriz_html) ===== */
+    .tabla-matriz { width: 100%; background-color: transparent; padding-bottom: 2px; }
+    .tabla-matriz table { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; border: 1px solid #f0f2f6; }
+    .tabla-matriz thead th {
+        position: sticky; top: 0; background-color: white !important; color: #0B083D !important;
+        z-index: 10; border-bottom: 2px solid #e6e9ef; border-right: 1px solid #f0f2f6;
+        padding: 12px 10px; text-align: center;
+    }
+    .tabla-matriz thead th.pinned-header-left { position: sticky; left: 0; z-index: 20; border-right: 2px solid #e6e9ef !important; }
+    .tabla-matriz thead th.pinned-header-right { position: sticky; right: 0; z-index: 20; border-left: 2px solid #e6e9ef !important; }
+    .tabla-matriz .sticky-left {
+        position: sticky; left: 0; background-color: #0B083D !important; color: white !important;
+        font-weight: bold; z-index: 5; border-right: 2px solid #e6e9ef !important;
+    }
+    .tabla-matriz .sticky-right {
+        position: sticky; right: 0; background-color: #0B083D !important; color: white !important;
+        font-weight: bold; z-index: 5; border-left: 2px solid #e6e9ef !important;
+    }
+    .tabla-matriz tfoot td {
+        position: sticky; bottom: 0; background-color: #0B083D !important; color: white !important;
+        font-weight: bold; z-index: 10; padding: 10px; border-top: 2px solid #e6e9ef;
+    }
+    .tabla-matriz tfoot td.sticky-left, .tabla-matriz tfoot td.sticky-right { z-index: 15; }
+    .tabla-matriz td {
+        padding: 8px 12px; border-bottom: 1px solid #f0f2f6; border-right: 1px solid #f0f2f6;
+        white-space: nowrap; background-color: white; color: #0B083D;
+    }
+
+    /* ===== Pro (mostrar_tabla_html_pro) ===== */
+    .tabla-pro { width: 100%; background-color: transparent; padding-bottom: 2px; }
+    .tabla-pro table { font-family: 'Segoe UI', sans-serif; border: 1px solid #f0f2f6; }
+    .tabla-pro thead th {
+        position: sticky; top: 0; background-color: white !important; color: #0B083D;
+        z-index: 10; border-bottom: 2px solid #e6e9ef; border-right: 1px solid #f0f2f6;
+        padding: 12px 10px; text-align: center;
+    }
+    .tabla-pro thead th.sticky-col { position: sticky; left: 0; z-index: 20; border-right: 2px solid #e6e9ef !important; }
+    .tabla-pro .sticky-left-cell {
+        position: sticky; left: 0; background-color: #0B083D !important; color: white !important;
+        font-weight: bold; z-index: 5; border-right: 2px solid #e6e9ef !important;
+    }
+    .tabla-pro tfoot td {
+        position: sticky; bottom: 0; background-color: #0B083D !important; color: white !important;
+        font-weight: bold; z-index: 10; padding: 10px; border-top: 2px solid #e6e9ef;
+    }
+    .tabla-pro tfoot td.sticky-left-cell { z-index: 15; }
+    .tabla-pro td { padding: 8px 12px; border-bottom: 1px solid #f0f2f6; border-right: 1px solid #f0f2f6; white-space: nowrap; }
+
+    /* ===== Normal (mostrar_tabla_normal_html) ===== */
+    .tabla-normal { width: 100%; background-color: transparent; }
+    .tabla-normal table { font-family: sans-serif; border: 1px solid #d1d5db; }
+    .tabla-normal th, .tabla-normal td { border: 1px solid #d1d5db !important; padding: 8px 12px; white-space: nowrap; }
+    .tabla-normal thead th { position: sticky; top: 0; background-color: white !important; color: #0B083D !important; z-index: 10; text-align: left; }
+    .tabla-normal thead th:first-child { text-align: right !important; }
+    .tabla-normal .h-pinned-left { position: sticky; left: 0; z-index: 20; border-right: 2px solid #d1d5db !important; }
+    .tabla-normal .h-pinned-right { position: sticky; right: 0; z-index: 20; border-left: 2px solid #d1d5db !important; }
+    .tabla-normal .cell-pinned-left { position: sticky; left: 0; z-index: 5; font-weight: bold; border-right: 2px solid #d1d5db !important; }
+    .tabla-normal .cell-pinned-right { position: sticky; right: 0; z-index: 5; font-weight: bold; border-left: 2px solid #d1d5db !important; background-color: #F8F9FA !important; }
+
+    /* ===== Clases de celda (en este orden: el degradado gana al fondo blanco) ===== */
+    .tabla-html td.cel-blanca { background-color: white; color: #0B083D; }
+    .tabla-html td.cel-negrita { font-weight: bold; background-color: white; }
+    .tabla-html td.cel-marino { background-color: #0B083D; color: white; }
+    .tabla-html td.cel-texto-marino { color: #0B083D; }
+    .tabla-html td.al-der { text-align: right; }
+    .tabla-html td.al-izq { text-align: left; }
+    .tabla-html td.espaciador { padding: 0 !important; border: 0 !important; background-color: white; }
+    .tabla-html td.deg-plano { background-color: #E3F2FD; color: #0B083D; }
+""" + _css_degradado() + """
+    .tabla-html td.sem { font-weight: bold; text-align: center; }
+    .tabla-pro td.sem-nada { background-color: transparent; }
+    .tabla-pro td.sem-verde { background-color: #1E7E34; color: white; }
+    .tabla-pro td.sem-amarillo { background-color: #FFC107; color: #212529; }
+    .tabla-pro td.sem-rojo { background-color: #DC3545; color: white; }
+    .tabla-normal td.sem-verde { background-color: #28a745; color: white; }
+    .tabla-normal td.sem-amarillo { background-color: #ffc107; color: #0B083D; }
+    .tabla-normal td.sem-rojo { background-color: #dc3545; color: white; }
+</style>
+"""
+
+
+def inyectar_estilos_tablas():
+    """
+    Inyecta ESTILOS_TABLAS en la página. Se llama una vez por corrida desde
+    dashboard.py: Streamlit borra en cada rerun los elementos que no se
+    vuelven a emitir, así que no basta con hacerlo una vez por sesión.
+    """
+    st.markdown(ESTILOS_TABLAS, unsafe_allow_html=True)
+
+
+def _html_tabla(partes: dict, max_height: int) -> str:
+    """Tabla HTML completa (todas las filas en el DOM) a partir de sus partes."""
+    return (
+        f'<div class="tabla-html {partes["variante"]}">'
+        f'<div class="table-container" style="max-height: {max_height}px;">'
+        f'<table><thead><tr>{partes["encabezados"]}</tr></thead><tbody>'
+        + _filas_html(partes["filas"], partes["celdas"])
+        + "</tbody>" + partes["pie"] + "</table></div></div>"
+    )
+
+
+# --------------------------------------------------
+# MODO VIRTUAL (FILAS EN VENTANA)
+# --------------------------------------------------
+# Con muchas filas (desgloses por cliente / proveedor) la tabla va en un
+# iframe (components.html): las celdas viajan por columna en un JSON
+# compacto (textos + clases codificadas contra un diccionario) y el JS
+# solo pinta las filas visibles más un margen, con filas espaciadoras
+# arriba y abajo. thead y tfoot son HTML normal, así que el encabezado,
+# los totales y las columnas fijas siguen siendo sticky.
+FILAS_VIRTUALIZAR = 300
+ALTO_FILA_PX = 35
+
+_JS_TABLA_VIRTUAL = """
+<script>
+(function () {
+    const datos = JSON.parse(document.getElementById("datos-tabla").textContent);
+    const contenedor = document.getElementById("contenedor-tabla");
+    const cuerpo = document.getElementById("cuerpo-tabla");
+    const columnas = datos.textos.length;
+    const margen = 20;
+    let alto = %(alto_fila)d;
+    let ventana = "";
+
+    function espaciador(px) {
+        return '<tr><td class="espaciador" colspan="' + columnas + '" style="height:' + px + 'px"></td></tr>';
+    }
+
+    function fila(i) {
+        let html = "<tr>";
+        for (let c = 0; c < columnas; c++) {
+            const clase = datos.clases[c];
+            html += '<td class="' + datos.diccionario[typeof clase === "number" ? clase : clase[i]] + '">'
+                + datos.textos[c][i] + "</td>";
+        }
+        return html + "</tr>";
+    }
+
+    function pintar() {
+        const inicio = Math.max(0, Math.floor(contenedor.scrollTop / alto) - margen);
+        const fin = Math.min(datos.filas, Math.ceil((contenedor.scrollTop + contenedor.clientHeight) / alto) + margen);
+        if (ventana === inicio + ":" + fin) return;
+        ventana = inicio + ":" + fin;
+
+        let html = espaciador(inicio * alto);
+        for (let i = inicio; i < fin; i++) html += fila(i);
+        cuerpo.innerHTML = html + espaciador((datos.filas - fin) * alto);
+    }
+
+    pintar();
+    // Alto real de una fila (fuente / padding de la variante) y repintado
+    const muestra = cuerpo.rows[1];
+    if (muestra && muestra.offsetHeight) {
+        alto = muestra.offsetHeight;
+        ventana = "";
+        pintar();
+    }
+    contenedor.addEventListener("scroll", () => window.requestAnimationFrame(pintar), { passive: true });
+})();
+</script>
+"""
+
+
+def _datos_virtuales(partes: dict) -> dict:
+    """Celdas por columna: textos y clases (un código si es igual en toda la columna)."""
+    diccionario = {}
+    clases_columnas = []
+    for clases, _ in partes["celdas"]:
+        if isinstance(clases, str):
+            clases_columnas.append(diccionario.setdefault(clases, len(diccionario)))
+        else:
+            codigos, unicos = pd.factorize(clases)
+            mapa = np.array([diccionario.setdefault(c, len(diccionario)) for c in unicos])
+            clases_columnas.append(mapa[codigos].tolist())
+
+    return {
+        "filas": partes["filas"],
+        "diccionario": list(diccionario),
+        "clases": clases_columnas,
+        "textos": [textos.tolist() for _, textos in partes["celdas"]],
+    }
+
+
+def _html_tabla_virtual(partes: dict, max_height: int) -> str:
+    """Documento para components.html con la tabla en modo virtual."""
+    datos = _datos_virtuales(partes)
+
+    # Ancho mínimo por columna (texto más largo): las columnas no "brincan"
+    # cuando cambian las filas pintadas
+    anchos = "".join(
+        f'<col style="width: {max(map(len, textos), default=1) + 4}ch;">'
+        for textos in datos["textos"]
+    )
+    json_datos = json.dumps(datos, ensure_ascii=False).replace("</", "<\\/")
+
+    return (
+        ESTILOS_TABLAS
+        + "<style>html, body { margin: 0; padding: 0; background: transparent; }</style>"
+        + f'<div class="tabla-html {partes["variante"]}">'
+        + f'<div class="table-container" id="contenedor-tabla" style="max-height: {max_height}px;">'
+        + f'<table><colgroup>{anchos}</colgroup><thead><tr>{partes["encabezados"]}</tr></thead>'
+        + '<tbody id="cuerpo-tabla"></tbody>' + partes["pie"] + "</table></div></div>"
+        + f'<script type="application/json" id="datos-tabla">{json_datos}</script>'
+        + _JS_TABLA_VIRTUAL % {"alto_fila": ALTO_FILA_PX}
+    )
+
+
+def _render_partes(partes: dict, max_height: int, virtualizar: bool = None) -> tuple:
+    """
+    (modo, documento, alto) listo para pintar. virtualizar=None decide solo:
+    modo virtual a partir de FILAS_VIRTUALIZAR filas, HTML completo por debajo.
+    """
+    if virtualizar is None:
+        virtualizar = partes["filas"] >= FILAS_VIRTUALIZAR
+
+    if not virtualizar:
+        return ("html", _html_tabla(partes, max_height), 0)
+
+    # El iframe no crece solo: alto estimado (encabezado + filas + pie), tope max_height
+    filas_visibles = partes["filas"] + (1 if partes["pie"] else 0)
+    alto = min(max_height, 50 + ALTO_FILA_PX * filas_visibles) + 4
+    return ("componente", _html_tabla_virtual(partes, max_height), alto)
+
+
+def _pintar_tabla(render: tuple):
+    modo, documento, alto = render
+    if modo == "html":
+        st.write(documento, unsafe_allow_html=True)
+    else:
+        components.html(documento, height=alto, scrolling=False)
+
+
+def _mostrar_tabla(nombre: str, version_datos, parametros, construir_partes, max_height, virtualizar):
+    """
+    Arma (o toma del cache de artefactos) y pinta una tabla. Con
+    version_datos, la tabla se reutiliza mientras no cambien los datos ni
+    los parámetros: quien llama garantiza que version_datos + parametros
+    determinan el DataFrame.
+    """
+    render = artefacto_renderizado(
+        nombre, version_datos, (parametros, max_height, virtualizar),
+        lambda: _render_partes(construir_partes(), max_height, virtualizar)
+    )
+    _pintar_tabla(render)
+
+
+def _filas_html(n_filas: int, celdas) -> str:
+    """celdas = [(clases, texto)] en el orden de las columnas."""
+    filas = np.full(n_filas, "<tr>", dtype=object)
+    for clases, texto in celdas:
+        if isinstance(clases, str):
+            filas = filas + f'<td class="{clases}">' + texto + "</td>"
+        else:
+            filas = filas + '<td class="' + clases + '">' + texto + "</td>"
+    return "".join((filas + "</tr>").tolist())
+
+
+def _unir_clases(*clases):
+    """Une clases (str o arreglos por fila) separadas por espacio, omitiendo las vacías."""
+    clases = [c for c in clases if not (isinstance(c, str) and not c)]
+    if not clases:
+        return ""
+    resultado = clases[0]
+    for clase in clases[1:]:
+        resultado = resultado + " " + clase
+    return resultado
+
+
+def _pie_html(columnas, footer_totals: dict, clase_columna) -> str:
+    """Fila <tfoot> de totales; clase_columna(col) da la clase de cada celda."""
+    html = "<tfoot><tr>"
+    for col in columnas:
+        val = footer_totals.get(col, "")
+        display_val = f"{val:,.2f}" if isinstance(val, (int, float)) else str(val)
+        html += f'<td class="{clase_columna(col)}">{display_val}</td>'
+    return html + "</tr></tfoot>"
+
+
+def _textos_columna(
+    serie: pd.Series,
+    porcentaje: bool = False,
+    como_texto: bool = False,
+    vacios=()
+) -> np.ndarray:
+    """
+    Texto de cada celda: f"{val:,.2f}" para números (o "{v:,.1f}%" con
+    porcentaje=True, escalando ×100 los valores en [-1.5, 1.5]), str(val)
+    para lo demás y "-" para nulos y para los textos en `vacios`.
+    """
+    def _numero(v):
+        if porcentaje:
+            return f"{v * 100 if abs(v) <= 1.5 else v:,.1f}%"
+        return f"{v:,.2f}"
+
+    if not como_texto and pd.api.types.is_numeric_dtype(serie.dtype):
+        numeros = serie.to_numpy(dtype=float, na_value=np.nan)
+        textos = np.array([_numero(v) for v in numeros.tolist()], dtype=object)
+    else:
+        textos = np.array(
+            [
+                _numero(v) if not como_texto and isinstance(v, (int, float)) else str(v)
+                for v in serie.tolist()
+            ],
+            dtype=object
+        )
+
+    vacio = serie.isna().to_numpy()
+    if vacios:
+        vacio = vacio | serie.astype(object).isin(vacios).to_numpy()
+    textos[vacio] = "-"
+    return textos
+
+
+def _clases_degradado(
+    valores: np.ndarray,
+    min_val: float,
+    max_val: float,
+    clase_nula: str = "cel-blanca",
+    clase_plana: str = None
+) -> np.ndarray:
+    """
+    Clase deg-<nivel> de cada valor de la columna (nivel = ratio cuantizado
+    a NIVELES_DEGRADADO pasos). Nulos con `clase_nula`; si min == max y hay
+    `clase_plana`, toda la columna la usa.
+    """
+    nulos = np.isnan(valores)
+    if max_val == min_val and clase_plana is not None:
+        clases = np.full(len(valores), clase_plana, dtype=object)
+        clases[nulos] = clase_nula
+        return clases
+
+    if max_val != min_val:
+        ratio = np.where(nulos, 0.0, (valores - min_val) / (max_val - min_val))
+    else:
+        ratio = np.zeros(len(valores))
+
+    nivel = np.clip(np.rint(ratio * NIVELES_DEGRADADO), 0, NIVELES_DEGRADADO).astype(int)
+    clases = np.char.add("deg-", nivel.astype(str)).astype(object)
+    clases[nulos] = clase_nula
+    return clases
+
+
+def _degradado_por_columna(serie: pd.Series) -> np.ndarray:
+    """Degradado con el min/max de la propia columna (tablas pro y normal)."""
+    numeros = pd.to_numeric(serie, errors="coerce")
+    return _clases_degradado(
+        numeros.to_numpy(dtype=float, na_value=np.nan), numeros.min(), numeros.max(),
+        clase_plana="deg-plano"
+    )
+
+
+def _partes_tabla_matriz(
     df: pd.DataFrame,
     header_left: list,
     data_columns: list,
     header_right: list = None,
-    footer_totals: dict = None,
-    max_height: int = 600
-):
-    if df.empty:
-        return
-
+    footer_totals: dict = None
+) -> dict:
+    """Encabezados, celdas y pie de mostrar_tabla_matriz_html."""
     header_right = header_right or []
-    
+
     # --- CÁLCULO DE ESCALA GLOBAL PARA DEGRADADO ---
-    valores = df[data_columns].values.flatten()
-    valores = valores[~pd.isna(valores)].astype(float)
+    valores = df[data_columns].to_numpy(dtype=float, na_value=np.nan).ravel()
+    valores = valores[~np.isnan(valores)]
     min_val = valores.min() if valores.size > 0 else 0
     max_val = valores.max() if valores.size > 0 else 1
 
-    def get_color(val):
-        if pd.isna(val): return "background-color: #ffffff; color: #0B083D;"
-        ratio = (float(val) - min_val) / (max_val - min_val) if max_val != min_val else 0
-        r = int(227 + ratio * (21 - 227))
-        g = int(242 + ratio * (101 - 242))
-        b = int(253 + ratio * (192 - 253))
-        text_color = "white" if ratio > 0.6 else "#0B083D"
-        return f"background-color: rgb({r},{g},{b}); color: {text_color};"
+    def clase_columna(col):
+        if col in header_left: return "sticky-left"
+        if col in header_right: return "sticky-right"
+        return ""
 
     # --- CONSTRUCCIÓN DEL HTML ---
-    html = f"""
-    <style>
-        .table-outer-wrapper {{
-            width: 100%;
-            background-color: transparent;
-            padding-bottom: 2px;
-        }}
-        .table-container {{
-            height: auto;
-            max-height: {max_height}px;
-            overflow: auto;
-            border: none;
-            position: relative;
-            background-color: transparent;
-        }}
-        table {{
-            border-collapse: separate;
-            border-spacing: 0;
-            width: 100%;
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            font-size: 0.85rem;
-            background-color: white;
-            border: 1px solid #f0f2f6;
-        }}
-        /* Estilo General del Header (Blanco) */
-        thead th {{
-            position: sticky;
-            top: 0;
-            background-color: white !important;
-            color: #0B083D !important;
-            z-index: 10;
-            border-bottom: 2px solid #e6e9ef;
-            border-right: 1px solid #f0f2f6;
-            padding: 12px 10px;
-            text-align: center;
-        }}
-        /* Header Pinned (Izquierda y Derecha pero en Blanco) */
-        thead th.pinned-header-left {{
-            position: sticky;
-            left: 0;
-            z-index: 20; /* Mayor que el resto del header */
-            border-right: 2px solid #e6e9ef !important;
-        }}
-        thead th.pinned-header-right {{
-            position: sticky;
-            right: 0;
-            z-index: 20;
-            border-left: 2px solid #e6e9ef !important;
-        }}
-        
-        /* Celdas del Cuerpo Pinned (Azules) */
-        .sticky-left {{
-            position: sticky;
-            left: 0;
-            background-color: #0B083D !important;
-            color: white !important;
-            font-weight: bold;
-            z-index: 5;
-            border-right: 2px solid #e6e9ef !important;
-        }}
-        .sticky-right {{
-            position: sticky;
-            right: 0;
-            background-color: #0B083D !important;
-            color: white !important;
-            font-weight: bold;
-            z-index: 5;
-            border-left: 2px solid #e6e9ef !important;
-        }}
-
-        /* Footer Fijo */
-        tfoot td {{
-            position: sticky;
-            bottom: 0;
-            background-color: #0B083D !important;
-            color: white !important;
-            font-weight: bold;
-            z-index: 10;
-            padding: 10px;
-            border-top: 2px solid #e6e9ef;
-        }}
-        /* Esquinas del Footer */
-        tfoot td.sticky-left {{ z-index: 15; }}
-        tfoot td.sticky-right {{ z-index: 15; }}
-
-        td {{
-            padding: 8px 12px;
-            border-bottom: 1px solid #f0f2f6;
-            border-right: 1px solid #f0f2f6;
-            white-space: nowrap;
-            background-color: white; 
-            color: #0B083D;
-        }}
+    encabezados = "".join([
+        f'<th class="'
+        f'{"pinned-header-left" if c in header_left else "pinned-header-right" if c in header_right else ""}'
+        f'">{c}</th>'
+        for c in df.columns
+    ])
+    celdas = []
+    for col in df.columns:
+        clase = clase_columna(col)
+        if col in data_columns:
+            clases = _unir_clases(clase, _clases_degradado(
+                df[col].to_numpy(dtype=float, na_value=np.nan), min_val, max_val
+            ))
+        else:
+            clases = clase or "cel-blanca"
+        celdas.append((clases, _textos_columna(df[col])))
+
+    return {
+        "variante": "tabla-matriz",
+        "encabezados": encabezados,
+        "celdas": celdas,
+        "filas": len(df),
+        "pie": _pie_html(df.columns, footer_totals, clase_columna) if footer_totals else "",
+    }
 
-        .table-container::-webkit-scrollbar {{ width: 7px; height: 7px; }}
-        .table-container::-webkit-scrollbar-track {{ background: transparent; }}
-        .table-container::-webkit-scrollbar-thumb {{ background: #d1d5db; border-radius: 10px; }}
-        .table-container::-webkit-scrollbar-thumb:hover {{ background: #9ca3af; }}
-    </style>
-    <div class="table-outer-wrapper">
-        <div class="table-container">
-            <table>
-                <thead>
-                    <tr>
-                        {"".join([
-                            f'<th class="'
-                            f'{"pinned-header-left" if c in header_left else "pinned-header-right" if c in header_right else ""}'
-                            f'">{c}</th>' 
-                            for c in df.columns
-                        ])}
-                    </tr>
-                </thead>
-                <tbody>
-    """
 
-    for _, row in df.iterrows():
-        html += "<tr>"
-        for col in df.columns:
-            val = row[col]
-            clase = ""
-            if col in header_left: clase = "sticky-left"
-            elif col in header_right: clase = "sticky-right"
-            
-            display_val = f"{val:,.2f}" if isinstance(val, (int, float)) else str(val)
-            if pd.isna(val): display_val = "-"
-
-            if col in data_columns:
-                estilo_celda = get_color(val)
-            else:
-                estilo_celda = "background-color: white;" if clase == "" else ""
+def construir_tabla_matriz_html(
+    df: pd.DataFrame,
+    header_left: list,
+    data_columns: list,
+    header_right: list = None,
+    footer_totals: dict = None,
+    max_height: int = 600
+) -> str:
+    """HTML de mostrar_tabla_matriz_html (estilos en ESTILOS_TABLAS)."""
+    partes = _partes_tabla_matriz(df, header_left, data_columns, header_right, footer_totals)
+    return _html_tabla(partes, max_height)
 
-            html += f'<td class="{clase}" style="{estilo_celda}">{display_val}</td>'
-        html += "</tr>"
 
-    if footer_totals:
-        html += "<tfoot><tr>"
-        for col in df.columns:
-            clase = ""
-            if col in header_left: clase = "sticky-left"
-            elif col in header_right: clase = "sticky-right"
-            val = footer_totals.get(col, "")
-            display_val = f"{val:,.2f}" if isinstance(val, (int, float)) else str(val)
-            html += f'<td class="{clase}">{display_val}</td>'
-        html += "</tr></tfoot>"
+def mostrar_tabla_matriz_html(
+    df: pd.DataFrame,
+    header_left: list,
+    data_columns: list,
+    header_right: list = None,
+    footer_totals: dict = None,
+    max_height: int = 600,
+    virtualizar: bool = None,
+    version_datos: str = None,
+    parametros_cache=()
+):
+    if df.empty:
+        return
 
-    html += "</table></div></div>"
-    
-    st.write(html, unsafe_allow_html=True)
+    _mostrar_tabla(
+        "tabla_matriz_html", version_datos,
+        (parametros_cache, tuple(header_left), tuple(data_columns), tuple(header_right or ())),
+        lambda: _partes_tabla_matriz(df, header_left, data_columns, header_right, footer_totals),
+        max_height, virtualizar
+    )
 
 
 
 
 
-def mostrar_tabla_html_pro(
+def _partes_tabla_pro(
     df: pd.DataFrame,
     columnas_fijas=None, # Las que van en azul marino a la izquierda
     columnas_numericas=None,
     columnas_sin_degradado=None,
     resaltar_primera_columna: bool = False,
-    max_height: int = 600,
     footer_totals: dict = None
-):
-    if df.empty:
-        return
-
+) -> dict:
+    """Encabezados, celdas y pie de mostrar_tabla_html_pro."""
     columnas_fijas = columnas_fijas or []
     columnas_numericas = columnas_numericas or []
     columnas_sin_degradado = columnas_sin_degradado or []
 
-    # --- LÓGICA DE COLORES (POR COLUMNA) ---
-    def get_color_columna(val, col_name):
-        if pd.isna(val) or col_name in columnas_sin_degradado:
-            return "background-color: white; color: #0B083D;"
-        
-        # Obtener min/max solo de esta columna para el degradado
-        col_data = df[col_name]
-        min_v = col_data.min()
-        max_v = col_data.max()
-        
-        if min_v == max_v:
-            return "background-color: #E3F2FD; color: #0B083D;"
-            
-        ratio = (float(val) - min_v) / (max_v - min_v) if max_v != min_v else 0
-        r = int(227 + ratio * (21 - 227))
-        g = int(242 + ratio * (101 - 242))
-        b = int(253 + ratio * (192 - 253))
-        text_color = "white" if ratio > 0.6 else "#0B083D"
-        return f"background-color: rgb({r},{g},{b}); color: {text_color};"
-
-    def get_semaforo(val):
-        colors = {
-            "VERDE": "background-color:#1E7E34;color:white;",
-            "AMARILLO": "background-color:#FFC107;color:#212529;",
-            "ROJO": "background-color:#DC3545;color:white;"
-        }
-        return colors.get(val, "background-color:transparent;") + "font-weight:bold;text-align:center;"
+    # --- SEMÁFORO (coincidencia exacta) ---
+    clases_semaforo = {"VERDE": "sem-verde", "AMARILLO": "sem-amarillo", "ROJO": "sem-rojo"}
 
     # --- CONSTRUCCIÓN DEL HTML ---
-    html = f"""
-    <style>
-        .table-outer-wrapper {{ width: 100%; background-color: transparent; padding-bottom: 2px; }}
-        .table-container {{ 
-            height: auto; max-height: {max_height}px; overflow: auto; 
-            position: relative; background-color: transparent; 
-        }}
-        table {{ 
-            border-collapse: separate; border-spacing: 0; width: 100%; 
-            font-family: 'Segoe UI', sans-serif; font-size: 0.85rem; 
-            background-color: white; border: 1px solid #f0f2f6;
-        }}
-        
-        /* Headers */
-        thead th {{
-            position: sticky; top: 0; background-color: white !important;
-            color: #0B083D; z-index: 10; border-bottom: 2px solid #e6e9ef;
-            border-right: 1px solid #f0f2f6; padding: 12px 10px; text-align: center;
-        }}
-        thead th.sticky-col {{ 
-            position: sticky; left: 0; z-index: 20; 
-            border-right: 2px solid #e6e9ef !important; 
-        }}
+    encabezados = "".join(
+        [f'<th class="{"sticky-col" if c in columnas_fijas else ""}">{c}</th>' for c in df.columns]
+    )
+    celdas = []
+    for col in df.columns:
+        serie = df[col]
+        clase = "sticky-left-cell" if col in columnas_fijas else ""
+
+        # Clases por columna completa
+        if col == "Semáforo":
+            clases = _unir_clases(
+                clase, "sem",
+                serie.astype(object).map(clases_semaforo).fillna("sem-nada").to_numpy(dtype=object)
+            )
+        elif col in columnas_numericas:
+            if col in columnas_sin_degradado:
+                clases = _unir_clases(clase, "cel-blanca al-der")
+            else:
+                clases = _unir_clases(clase, _degradado_por_columna(serie), "al-der")
+        elif col in columnas_fijas:
+            # Si no queremos que la primera columna sea azul marino, quitamos esta clase
+            clases = clase if resaltar_primera_columna else "cel-negrita"
+        else:
+            clases = _unir_clases(clase, "cel-blanca")
 
-        /* Filas Ancladas (Izquierda) */
-        .sticky-left-cell {{
-            position: sticky; left: 0; background-color: #0B083D !important;
-            color: white !important; font-weight: bold; z-index: 5;
-            border-right: 2px solid #e6e9ef !important;
-        }}
+        textos = _textos_columna(serie, como_texto=(col == "Semáforo"), vacios=("None",))
+        celdas.append((clases, textos))
 
-        /* Footer */
-        tfoot td {{
-            position: sticky; bottom: 0; background-color: #0B083D !important;
-            color: white !important; font-weight: bold; z-index: 10;
-            padding: 10px; border-top: 2px solid #e6e9ef;
-        }}
-        tfoot td.sticky-left-cell {{ z-index: 15; }}
+    pie = ""
+    if footer_totals:
+        pie = _pie_html(
+            df.columns, footer_totals,
+            lambda col: "sticky-left-cell" if col in columnas_fijas else ""
+        )
 
-        td {{ 
-            padding: 8px 12px; border-bottom: 1px solid #f0f2f6; 
-            border-right: 1px solid #f0f2f6; white-space: nowrap; 
-        }}
+    return {
+        "variante": "tabla-pro",
+        "encabezados": encabezados,
+        "celdas": celdas,
+        "filas": len(df),
+        "pie": pie,
+    }
 
-        /* Scrollbar custom */
-        .table-container::-webkit-scrollbar {{ width: 7px; height: 7px; }}
-        .table-container::-webkit-scrollbar-thumb {{ background: #d1d5db; border-radius: 10px; }}
-    </style>
-    <div class="table-outer-wrapper">
-        <div class="table-container">
-            <table>
-                <thead>
-                    <tr>
-                        {"".join([f'<th class="{"sticky-col" if c in columnas_fijas else ""}">{c}</th>' for c in df.columns])}
-                    </tr>
-                </thead>
-                <tbody>
-    """
 
-    for _, row in df.iterrows():
-        html += "<tr>"
-        for col in df.columns:
-            val = row[col]
-            clase = "sticky-left-cell" if col in columnas_fijas else ""
-            
-            # Estilo dinámico
-            estilo = ""
-            if col == "Semáforo":
-                estilo = get_semaforo(val)
-            elif col in columnas_numericas:
-                estilo = get_color_columna(val, col) + "text-align: right;"
-            elif col in columnas_fijas:
-                # Si no queremos que la primera columna sea azul marino, quitamos esta clase
-                if not resaltar_primera_columna:
-                    clase = "" 
-                    estilo = "font-weight: bold; background-color: white;"
-            else:
-                estilo = "background-color: white; color: #0B083D;"
+def mostrar_tabla_html_pro(
+    df: pd.DataFrame,
+    columnas_fijas=None,
+    columnas_numericas=None,
+    columnas_sin_degradado=None,
+    resaltar_primera_columna: bool = False,
+    max_height: int = 600,
+    footer_totals: dict = None,
+    virtualizar: bool = None,
+    version_datos: str = None,
+    parametros_cache=()
+):
+    if df.empty:
+        return
 
-            display_val = f"{val:,.2f}" if isinstance(val, (int, float)) and col != "Semáforo" else str(val)
-            if pd.isna(val) or val == "None": display_val = "-"
+    _mostrar_tabla(
+        "tabla_html_pro", version_datos,
+        (
+            parametros_cache, tuple(columnas_fijas or ()), tuple(columnas_numericas or ()),
+            tuple(columnas_sin_degradado or ()), resaltar_primera_columna
+        ),
+        lambda: _partes_tabla_pro(
+            df, columnas_fijas, columnas_numericas, columnas_sin_degradado,
+            resaltar_primera_columna, footer_totals
+        ),
+        max_height, virtualizar
+    )
 
-            html += f'<td class="{clase}" style="{estilo}">{display_val}</td>'
-        html += "</tr>"
 
-    if footer_totals:
-        html += "<tfoot><tr>"
-        for col in df.columns:
-            clase = "sticky-left-cell" if col in columnas_fijas else ""
-            val = footer_totals.get(col, "")
-            display_val = f"{val:,.2f}" if isinstance(val, (int, float)) else str(val)
-            html += f'<td class="{clase}">{display_val}</td>'
-        html += "</tr></tfoot>"
 
-    html += "</table></div></div>"
-    st.write(html, unsafe_allow_html=True)
 
 
+def _partes_tabla_normal(
+    df: pd.DataFrame,
+    columnas_fijas=None,
+    columnas_numericas=None,
+    columnas_sin_degradado=None,
+    columna_total=None,
+    resaltar_primera_columna: bool = False
+) -> dict:
+    """Encabezados y celdas de mostrar_tabla_normal_html (no lleva pie)."""
+    columnas_fijas = columnas_fijas or []
+    columnas_numericas = columnas_numericas or []
+    columnas_sin_degradado = columnas_sin_degradado or []
 
+    # --- ENCABEZADO ---
+    encabezados = "".join([
+        f'<th class="{"h-pinned-left" if c in columnas_fijas else "h-pinned-right" if c == columna_total else ""}" '
+        f'style="text-align: {"right" if i == 0 else "left"}">{c}</th>'
+        for i, c in enumerate(df.columns)
+    ])
+    # --- CUERPO (por columna) ---
+    celdas = []
+    for i, col in enumerate(df.columns):
+        serie = df[col]
+        clases = ""
+        alineacion = "al-der" if i == 0 else "al-izq"
+
+        # 1. Lógica de Semáforo (por contenido: "VERDE", "Verde 95%", ...)
+        if col == "Semáforo":
+            texto_mayus = serie.astype(str).str.upper()
+            color = np.select(
+                [
+                    texto_mayus.str.contains("VERDE", regex=False),
+                    texto_mayus.str.contains("AMARILLO", regex=False),
+                    texto_mayus.str.contains("ROJO", regex=False),
+                ],
+                ["sem-verde", "sem-amarillo", "sem-rojo"],
+                default="cel-blanca"
+            ).astype(object)
+            clases = _unir_clases("sem", color)
+
+        # 2. Determinar anclajes
+        elif col in columnas_fijas:
+            fondo = "cel-marino" if i == 0 and resaltar_primera_columna else "cel-blanca"
+            clases = f"cell-pinned-left {fondo} {alineacion}"
+        elif col == columna_total:
+            clases = f"cell-pinned-right cel-texto-marino {alineacion}"
+
+        # 3. Determinar Degradado
+        if col in columnas_numericas and col not in columnas_sin_degradado and col != "Semáforo":
+            clases = _unir_clases(clases, _degradado_por_columna(serie), alineacion)
+        elif isinstance(clases, str) and not clases:
+            clases = f"cel-blanca {alineacion}"
+
+        porcentaje = "%" in col or "Variación" in col
+        celdas.append((clases, _textos_columna(serie, porcentaje=porcentaje)))
+
+    return {
+        "variante": "tabla-normal",
+        "encabezados": encabezados,
+        "celdas": celdas,
+        "filas": len(df),
+        "pie": "",
+    }
 
 
 def mostrar_tabla_normal_html(
@@ -917,141 +1317,23 @@ def mostrar_tabla_normal_html(
     columnas_sin_degradado=None,
     columna_total=None,
     max_height=600,
-    resaltar_primera_columna: bool = False
+    resaltar_primera_columna: bool = False,
+    virtualizar: bool = None,
+    version_datos: str = None,
+    parametros_cache=()
 ):
     if df.empty:
         return
 
-    columnas_fijas = columnas_fijas or []
-    columnas_numericas = columnas_numericas or []
-    columnas_sin_degradado = columnas_sin_degradado or []
-
-    # --- LÓGICA DE DEGRADADO POR COLUMNA ---
-    stats_columnas = {}
-    for col in columnas_numericas:
-        if col in df.columns and col not in columnas_sin_degradado:
-            col_data = pd.to_numeric(df[col], errors='coerce')
-            stats_columnas[col] = {
-                "min": col_data.min(),
-                "max": col_data.max()
-            }
-
-    def get_color_por_columna(val, col_name):
-        if col_name not in stats_columnas or pd.isna(val):
-            return "background-color: white; color: #0B083D;"
-        stats = stats_columnas[col_name]
-        min_v, max_v = stats["min"], stats["max"]
-        if max_v == min_v:
-            return "background-color: #E3F2FD; color: #0B083D;"
-        ratio = (float(val) - min_v) / (max_v - min_v)
-        r = int(227 + ratio * (21 - 227))
-        g = int(242 + ratio * (101 - 242))
-        b = int(253 + ratio * (192 - 253))
-        text_color = "white" if ratio > 0.6 else "#0B083D"
-        return f"background-color: rgb({r},{g},{b}); color: {text_color};"
-
-    # --- CSS ---
-    html = f"""
-    <style>
-        .table-outer-wrapper {{ width: 100%; background-color: transparent; }}
-        .table-container {{
-            height: auto;
-            max-height: {max_height}px;
-            overflow: auto;
-            position: relative;
-        }}
-        table {{
-            border-collapse: separate;
-            border-spacing: 0;
-            width: 100%;
-            font-family: sans-serif;
-            font-size: 0.85rem;
-            background-color: white;
-            border: 1px solid #d1d5db;
-        }}
-        th, td {{
-            border: 1px solid #d1d5db !important;
-            padding: 8px 12px;
-            white-space: nowrap;
-        }}
-        thead th {{
-            position: sticky;
-            top: 0;
-            background-color: white !important;
-            color: #0B083D !important;
-            z-index: 10;
-            text-align: left;
-        }}
-        thead th:first-child {{ text-align: right !important; }}
-        .h-pinned-left {{ position: sticky; left: 0; z-index: 20; border-right: 2px solid #d1d5db !important; }}
-        .h-pinned-right {{ position: sticky; right: 0; z-index: 20; border-left: 2px solid #d1d5db !important; }}
-        .cell-pinned-left {{ position: sticky; left: 0; z-index: 5; font-weight: bold; border-right: 2px solid #d1d5db !important; }}
-        .cell-pinned-right {{ position: sticky; right: 0; z-index: 5; font-weight: bold; border-left: 2px solid #d1d5db !important; background-color: #F8F9FA !important; }}
-        .table-container::-webkit-scrollbar {{ width: 7px; height: 7px; }}
-        .table-container::-webkit-scrollbar-thumb {{ background: #d1d5db; border-radius: 10px; }}
-    </style>
-    <div class="table-outer-wrapper">
-        <div class="table-container">
-            <table>
-                <thead>
-                    <tr>
-                        {"".join([f'<th class="{"h-pinned-left" if c in columnas_fijas else "h-pinned-right" if c == columna_total else ""}" style="text-align: {"right" if i == 0 else "left"}">{c}</th>' for i, c in enumerate(df.columns)])}
-                    </tr>
-                </thead>
-                <tbody>
-    """
-
-    # --- CUERPO ---
-    for _, row in df.iterrows():
-        html += "<tr>"
-        for i, col in enumerate(df.columns):
-            val = row[col]
-            clase = ""
-            estilo_extra = ""
-            alineacion = "text-align: right;" if i == 0 else "text-align: left;"
-            
-            # 1. Lógica de Semáforo
-            if col == "Semáforo":
-                color_bg = "white"
-                color_txt = "#0B083D"
-                val_str = str(val).upper()
-                if "VERDE" in val_str: color_bg = "#28a745"; color_txt = "white"
-                elif "AMARILLO" in val_str: color_bg = "#ffc107"; color_txt = "#0B083D"
-                elif "ROJO" in val_str: color_bg = "#dc3545"; color_txt = "white"
-                estilo_extra = f"background-color: {color_bg}; color: {color_txt}; font-weight: bold; text-align: center;"
-            
-            # 2. Determinar anclajes
-            elif col in columnas_fijas:
-                clase = "cell-pinned-left"
-                if i == 0 and resaltar_primera_columna:
-                    estilo_extra = f"background-color: #0B083D; color: white; {alineacion}"
-                else:
-                    estilo_extra = f"background-color: white; color: #0B083D; {alineacion}"
-            elif col == columna_total:
-                clase = "cell-pinned-right"
-                estilo_extra = f"color: #0B083D; {alineacion}"
-
-            # 3. Determinar Degradado
-            if col in columnas_numericas and col not in columnas_sin_degradado and col != "Semáforo":
-                estilo_extra += get_color_por_columna(val, col)
-                estilo_extra += alineacion 
-            elif not estilo_extra:
-                estilo_extra = f"background-color: white; color: #0B083D; {alineacion}"
-
-            # Formato de visualización
-            if pd.isna(val):
-                display_val = "-"
-            elif isinstance(val, (int, float)):
-                if "%" in col or "Variación" in col:
-                    v = val * 100 if abs(val) <= 1.5 else val
-                    display_val = f"{v:,.1f}%"
-                else:
-                    display_val = f"{val:,.2f}"
-            else:
-                display_val = str(val)
-            
-            html += f'<td class="{clase}" style="{estilo_extra}">{display_val}</td>'
-        html += "</tr>"
-
-    html += "</tbody></table></div></div>"
-    st.write(html, unsafe_allow_html=True)
\ No newline at end of file
+    _mostrar_tabla(
+        "tabla_normal_html", version_datos,
+        (
+            parametros_cache, tuple(columnas_fijas or ()), tuple(columnas_numericas or ()),
+            tuple(columnas_sin_degradado or ()), columna_total, resaltar_primera_columna
+        ),
+        lambda: _partes_tabla_normal(
+            df, columnas_fijas, columnas_numericas, columnas_sin_degradado,
+            columna_total, resaltar_primera_columna
+        ),
+        max_height, virtualizar
+    )